@@ -0,0 +1,253 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import datetime
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+
+# |===============================================================================================================================|
+# |                                                                                                                               |
+# |                         HOW FAST IS THE PARADE STATE? (python Benchmark.py --output benchmark.json)                           |
+# |                                                                                                                               |
+# | --> Runs fully offline, on a copy of the data folder (data is never changed, nothing is downloaded)                           |
+# |     --> only dates of the months in data/database/me are used (Dec 23, Jan 24 and Feb 24)                                     |
+# | --> --scales 1 10 50: 1 is the data folder as it is, 10/50 is the data folder with 10x/50x the personnel                      |
+# |     (every person is copied with a new sheetName, and their ME rows are copied with them, Jan 24 has 31 days)                 |
+# | --> Every scale runs in its own python process, so caches and memory of one scale do not affect the next one                  |
+# |                                                                                                                               |
+# | STAGES (each stage is ran --repeat times in 3 ways, the median of each is reported):                                          |
+# | --> cold     - every cache cleared first (DataStore, History/ADW/override indexes, maps, StateStore reads and results)        |
+# | --> uncached - only ParadeState.resultCache cleared first (files already parsed, the result is worked out again)              |
+# | --> cached   - nothing cleared (result taken from ParadeState.resultCache if the stage keeps one, CombinedDutyForecast        |
+# |                 and FindMergedCells do not, so for them cached is about the same as uncached)                                 |
+# | 1. FullPS               - DataManager.FullPS for every day of Jan 24                                                          |
+# | 2. CombinedBottomPS     - /we over 9 days, across 2 months (28/1/24 - 5/2/24)                                                 |
+# | 3. CombinedDutyForecast - /df data over 30 days (2/1/24 - 31/1/24)                                                            |
+# | 4. DutyForecastExcel    - ExcelProcesser.ObtainDutyForecastExcel over the same 30 days                                        |
+# | 5. FindMergedCells      - Scheduled.FindMergedCells on the Jan 24 ME sheet (every 7th row has a merged block of 3 days)       |
+# |                                                                                                                               |
+# | OUTPUT (json):                                                                                                                |
+# | --> {createdAt, commit, python, platform, repeat, scales: {scale: {personnel, stages: {stage: STAGE}}}}                       |
+# | --> STAGE: {cold, uncached, cached (seconds), runs (DICT of LIST of seconds for each), peakMemory (bytes, tracemalloc,        |
+# |     its own cold run before the timed runs)}                                                                                  |
+# |     --> compare 2 files of runs before and after a change                                                                     |
+# |                                                                                                                               |
+# |===============================================================================================================================|
+
+root = os.path.dirname(os.path.abspath(__file__))
+
+def dt(day, month, year=2024):
+    return datetime.datetime(year, month, day)
+
+# copies data into folder, with scale times the personnel
+def MakeData(folder, scale):
+    import SheetStore
+    import pandas as pd
+
+    shutil.copytree(
+        os.path.join(root, 'data'), os.path.join(folder, 'data'),
+        ignore=shutil.ignore_patterns('*.db', '*.db-wal', '*.db-shm', '*.layout.json')
+    )
+
+    if scale == 1:
+        return
+
+    copied = set()
+
+    for flight in ['alpha', 'bravo', 'others']:
+        path = os.path.join(folder, f'data/personnel/{flight}.json')
+
+        with open(path) as file:
+            personnel = json.load(file)
+
+        result = list(personnel)
+        for x in range(1, scale):
+            for person in personnel:
+                result.append({
+                    **person,
+                    'sheetName': f'{person["sheetName"]} {x}',
+                    'displayName': f'{person["displayName"]} {x}',
+                    'displayNoStatus': f'{person["displayNoStatus"]} {x}',
+                    'commSec': 'NIL'
+                })
+
+        copied.update(person['sheetName'] for person in personnel)
+
+        with open(path, 'w') as file:
+            json.dump(result, file, indent=1)
+
+    # copies of the ME rows are placed just above the commSec rows (between TOP and MIDDLE)
+    commSecs = CommSecs(folder)
+
+    for name in os.listdir(os.path.join(folder, 'data/database/me')):
+        if not name.endswith('.csv'):
+            continue
+
+        path = os.path.join(folder, 'data/database/me', name)
+        meDF = pd.read_csv(path)
+        rows = meDF.values.tolist()
+
+        layout = SheetStore.MonthSheet(rows).Layout(copied, commSecs)
+
+        sheetRows = [row for row in rows[layout.top:layout.middle] if isinstance(row[0], str) and row[0].upper().strip() in copied]
+        extraRows = [[f'{row[0].strip()} {x}'] + row[1:] for x in range(1, scale) for row in sheetRows]
+
+        pd.DataFrame(rows[:layout.middle] + extraRows + rows[layout.middle:], columns=meDF.columns).to_csv(path, index=False)
+
+def CommSecs(folder):
+    commSecs = set()
+
+    for flight in ['alpha', 'bravo', 'others']:
+        with open(os.path.join(folder, f'data/personnel/{flight}.json')) as file:
+            commSecs.update(x['commSec'] for x in json.load(file) if x['commSec'] != 'NIL')
+
+    return commSecs
+
+def Stages():
+    import numpy as np
+    import Scheduled
+    import SheetStore
+    import ExcelProcesser
+    import ParadeState as ps
+
+    def FullPS():
+        for day in range(1, 32):
+            ps.DataManager(None).FullPS(dt(day, 1))
+
+    def CombinedBottomPS():
+        ps.DataManager().CombinedBottomPS(dt(28, 1), dt(5, 2))
+
+    def CombinedDutyForecast():
+        list(ps.DataManager().CombinedDutyForecast(dt(2, 1), dt(31, 1)))
+
+    def DutyForecastExcel():
+        ExcelProcesser.ObtainDutyForecastExcel(dt(2, 1), dt(31, 1))
+
+    withoutMerge = np.array([[str(x) for x in row] for row in SheetStore.OpenME(dt(1, 1)).rows], dtype=str)
+    withMerge = withoutMerge.copy()
+    withMerge[::7, 6:9] = 'NIL'
+
+    def FindMergedCells():
+        Scheduled.FindMergedCells(withMerge, withoutMerge, 2024, 1)
+
+    return {
+        'FullPS': FullPS,
+        'CombinedBottomPS': CombinedBottomPS,
+        'CombinedDutyForecast': CombinedDutyForecast,
+        'DutyForecastExcel': DutyForecastExcel,
+        'FindMergedCells': FindMergedCells
+    }
+
+# every module level cache, so the next run parses and works out everything again
+def ClearCaches():
+    import DataStore
+    import Functions
+    import StateStore
+    import SheetStore
+    import OverrideIndex
+    import ParadeState as ps
+
+    DataStore.Invalidate()
+    Functions.mapCache.clear()
+    StateStore.readCache.clear()
+    SheetStore.historyCache.clear()
+    SheetStore.adwIndexCache.update({'version': None, 'index': None})
+    OverrideIndex.indexCache.update({'version': None, 'index': None})
+    ps.ClearResults()
+    ps.ClearStatusTable()
+
+def Time(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+# ran inside the folder made by MakeData (see Main)
+def RunScale(repeat):
+    import DataStore
+    import ParadeState as ps
+    stages = Stages()
+    result = {'personnel': sum(len(DataStore.Load(f'data/personnel/{flight}.json')) for flight in ['alpha', 'bravo', 'others']), 'stages': {}}
+
+    for name, func in stages.items():
+        ClearCaches()
+        tracemalloc.start()
+        func()
+        peakMemory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        runs = {'cold': [], 'uncached': [], 'cached': []}
+
+        for _ in range(repeat):
+            ClearCaches()
+            runs['cold'].append(Time(func))
+
+            # everything but the results is kept, so this is the time to work the result out again
+            ps.ClearResults()
+            runs['uncached'].append(Time(func))
+
+            runs['cached'].append(Time(func))
+
+        result['stages'][name] = {
+            **{x: statistics.median(runs[x]) for x in runs},
+            'runs': runs,
+            'peakMemory': peakMemory
+        }
+
+    return result
+
+def Commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=root, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def Main():
+    parser = argparse.ArgumentParser(description='Offline benchmark of the parade state')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # child process - folder already made, print the result of this scale
+    if args.run is not None:
+        os.chdir(args.run)
+        print(json.dumps(RunScale(args.repeat)))
+        return
+
+    report = {
+        'createdAt': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': Commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'scales': {}
+    }
+
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory(prefix='benchmark') as folder:
+            MakeData(folder, scale)
+
+            process = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--run', folder, '--repeat', str(args.repeat)],
+                capture_output=True, text=True, check=True
+            )
+            report['scales'][str(scale)] = json.loads(process.stdout.strip().splitlines()[-1])
+
+        for name, stage in report['scales'][str(scale)]['stages'].items():
+            print(
+                f'{scale}x {name}: cold {stage["cold"]:.4f}s, uncached {stage["uncached"]:.4f}s, cached {stage["cached"]:.4f}s, '
+                f'peak {stage["peakMemory"] / 2 ** 20:.1f} MiB'
+            )
+
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=1)
+
+if __name__ == '__main__':
+    Main()
@@ -0,0 +1,149 @@
+import os
+import time
+import asyncio
+import StateStore
+import Functions
+from telegram.error import TelegramError, RetryAfter, Forbidden, ChatMigrated, BadRequest, NetworkError
+
+# |===============================================================================================================================|
+# |                                                                                                                               |
+# |                           SENDS ONE MESSAGE TO EVERY USER OF THE BOT (/broadcast in run.py)                                   |
+# |                                                                                                                               |
+# | --> Messages are sent to many chats at the same time, but never faster than telegram allows                                   |
+# |     (about 30 messages a second in total and 1 message a second to the same chat)                                             |
+# | --> If telegram says to slow down (RetryAfter), every send waits for as long as telegram asks and the message is sent again   |
+# | --> A chat that blocked the bot or no longer exists is "dead": it is saved in StateStore (deadChats) and skipped next time    |
+# |     (until that user uses /start again)                                                                                       |
+# | --> Chats that still fail after retrying (eg. connection errors) are "failed" and are tried again next broadcast              |
+# | --> The progress message is edited while sending (at most once every progressInterval seconds)                                |
+# |     --> a failed edit (eg. RetryAfter, connection error) is skipped, it never stops the broadcast                             |
+# |                                                                                                                               |
+# | Limits (from .env, optional):                                                                                                 |
+# | --> BROADCAST_RATE        - max messages a second over all chats (default 25)                                                 |
+# | --> BROADCAST_CONCURRENCY - max messages being sent at the same time (default 10)                                             |
+# |                                                                                                                               |
+# | FUNCTIONS:                                                                                                                    |
+# | 1. Broadcast(bot, text, progressChatID, progressMessageID) - sends text to every chat in StateStore.Users() (await it)        |
+# |    --> returns DICT {sent: LIST chatID, failed: DICT chatID: reason, dead: DICT chatID: reason}                               |
+# |    --> ran with application.create_task() in run.py, so /broadcast (and every other command) does not wait for it             |
+# | 2. Summary(result)        - message shown at the end of a broadcast                                                           |
+# |                                                                                                                               |
+# | CLASS RateLimiter:                                                                                                            |
+# | --> await Wait() - returns when the next message can be sent (messages are spaced 1 / rate seconds apart)                     |
+# | --> Pause(seconds) - no message is sent for seconds (RetryAfter from telegram is for the whole bot, not just one chat)        |
+# |                                                                                                                               |
+# |===============================================================================================================================|
+
+perChatInterval = 1
+retries = 3
+progressInterval = 1
+
+class RateLimiter:
+    def __init__(self, rate):
+        self.interval = 1 / rate
+        self.nextTime = 0
+        self.lock = asyncio.Lock()
+
+    async def Wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            sendTime = max(now, self.nextTime)
+            self.nextTime = sendTime + self.interval
+
+        await asyncio.sleep(sendTime - now)
+
+    def Pause(self, seconds):
+        self.nextTime = max(self.nextTime, time.monotonic() + seconds)
+
+async def __Send(bot, limiter, chatID, text, result):
+    lastSent = None
+
+    for attempt in range(retries + 1):
+        await limiter.Wait()
+
+        # same chat is never sent to more than once every perChatInterval seconds
+        if lastSent is not None:
+            await asyncio.sleep(max(0, lastSent + perChatInterval - time.monotonic()))
+        lastSent = time.monotonic()
+
+        try:
+            await bot.send_message(chatID, text)
+            result['sent'].append(chatID)
+            return
+        except RetryAfter as error:
+            limiter.Pause(error.retry_after)
+            reason = 'flood limit'
+        except Forbidden as error:
+            result['dead'][chatID] = error.message
+            return
+        except ChatMigrated as error:
+            chatID = error.new_chat_id
+            reason = 'chat migrated'
+        except BadRequest as error:
+            if 'chat not found' in error.message.lower():
+                result['dead'][chatID] = error.message
+            else:
+                result['failed'][chatID] = error.message
+            return
+        except NetworkError as error:
+            await asyncio.sleep(2 ** attempt)
+            reason = error.message
+
+    result['failed'][chatID] = reason
+
+# returns when done is set or after seconds
+async def __Wait(done, seconds):
+    try:
+        await asyncio.wait_for(done.wait(), seconds)
+    except asyncio.TimeoutError:
+        pass
+
+# progress is only shown, a failed edit never stops the broadcast
+async def __Progress(bot, limiter, result, total, progressChatID, progressMessageID, done):
+    while not done.is_set():
+        await __Wait(done, progressInterval)
+
+        finished = len(result['sent']) + len(result['failed']) + len(result['dead'])
+
+        try:
+            await bot.edit_message_text(f'Broadcasting... {finished}/{total} Done', progressChatID, progressMessageID)
+        except RetryAfter as error:
+            # flood limit is for the whole bot, so the sends wait too, progress is not shown until it is over
+            limiter.Pause(error.retry_after)
+            await __Wait(done, error.retry_after)
+        except TelegramError:
+            # eg. message is the same as before, connection errors
+            pass
+
+async def Broadcast(bot, text, progressChatID=None, progressMessageID=None):
+    deadChats = StateStore.DeadChats()
+    chatIDs = [x for x in StateStore.Users() if x not in deadChats]
+
+    limiter = RateLimiter(float(os.getenv('BROADCAST_RATE', 25)))
+    concurrency = asyncio.Semaphore(int(os.getenv('BROADCAST_CONCURRENCY', 10)))
+    result = {'sent': [], 'failed': {}, 'dead': {}}
+
+    async def Send(chatID):
+        async with concurrency:
+            await __Send(bot, limiter, chatID, text, result)
+
+    done = asyncio.Event()
+    progress = None
+    if progressMessageID is not None:
+        progress = asyncio.create_task(__Progress(bot, limiter, result, len(chatIDs), progressChatID, progressMessageID, done))
+
+    try:
+        await asyncio.gather(*[Send(x) for x in chatIDs])
+    finally:
+        done.set()
+        if progress is not None:
+            # an error in the progress task is never raised here (the result and dead chats are still saved)
+            await asyncio.gather(progress, return_exceptions=True)
+
+    if result['dead']:
+        StateStore.AddDeadChats(result['dead'], Functions.CurrentDatetime().strftime('%d/%m/%y at %#I:%M %p'))
+
+    return result
+
+def Summary(result):
+    return f'Message Broadcasted.\nSent: {len(result["sent"])}\nFailed: {len(result["failed"])}\nBlocked/deleted: {len(result["dead"])}'
@@ -0,0 +1,189 @@
+import io
+import os
+import csv
+import copy
+import hashlib
+import threading
+from ujson import loads, dumps
+
+# |================================================================================================================================|
+# |                                                                                                                                |
+# |                              PROCESS-WIDE STORE FOR EVERYTHING READ FROM THE data FOLDER                                       |
+# |                                                                                                                                |
+# | Every file is parsed ONCE and kept in memory. A file is only parsed again when it has actually changed:                        |
+# | --> os.stat is checked on every Load(path). If mtime and size are the same as the cached copy, the cached copy is returned.    |
+# | --> If mtime or size changed, the file is read and hashed. If the hash is the same as the cached copy                          |
+# |     (eg. file was rewritten with the same content), the cached copy is kept and NOT parsed again.                              |
+# | --> Otherwise the file is parsed again and the file gets a new version.                                                        |
+# |                                                                                                                                |
+# | FUNCTIONS:                                                                                                                     |
+# | 1. Load(path, parser)  - returns the parsed file (parsed with ujson by default)                                                |
+# |                          !!! the returned object is SHARED between everyone, DO NOT change it !!!                              |
+# | 2. LoadCopy(path)      - returns a copy of the parsed file (use this if the object is going to be changed and saved)           |
+# | 3. Dump(path, data)    - saves data as json (indent=1) and places it in the store (no need to parse it again)                  |
+# |                          file is written to a temporary file first and then replaced, so no one reads a half written file     |
+# | 4. Version(*paths)     - returns a tuple of the versions of the files given                                                    |
+# |                          --> if any of the files are changed, the tuple will be different (used for caching results)           |
+# | 5. Write(path, content) - saves content (bytes) ONLY if it is different from what is already saved (compared by hash)          |
+# |                          --> returns TRUE if the file was changed, unchanged files keep their version (caches stay warm)       |
+# | 6. Hash(*paths)        - hash of the content of the files given (hex string)                                                   |
+# |                          --> unlike Version(), stays the same when the bot is restarted (used for files saved to disk)         |
+# | 7. Invalidate(path)    - removes file from the store (next Load(path) will parse the file again)                               |
+# | 8. ReadCSV(content, missing) - rows of a csv file (bytes) without the header row, made with the csv module (no pandas)         |
+# |                          --> same rows as pd.read_csv(...).values.tolist() for the sheets in data/database, every cell is      |
+# |                              a string, except empty cells (and NA, N/A, ... that pandas also reads as empty) which are missing |
+# |                          --> eg. DataStore.Load(path, DataStore.ReadCSV)                                                       |
+# |                                                                                                                                |
+# |================================================================================================================================|
+
+cache = {}
+lock = threading.Lock()
+versionCounter = [0]
+
+def __NextVersion():
+    versionCounter[0] += 1
+    return versionCounter[0]
+
+# files that are only needed for their version (eg. csv files used by Version()) are not parsed
+def __NoParser(content):
+    return None
+
+def __Read(path, parser, statKey):
+    with open(path, 'rb') as file:
+        content = file.read()
+
+    digest = hashlib.blake2b(content, digest_size=16).digest()
+    entry = cache.get(path)
+
+    # file was touched but content is the same (version stays the same)
+    if entry is not None and entry['hash'] == digest:
+        entry['stat'] = statKey
+
+        if entry['parser'] is not parser:
+            entry['data'] = parser(content)
+            entry['parser'] = parser
+
+        return entry
+
+    entry = {'stat': statKey, 'hash': digest, 'version': __NextVersion(), 'parser': parser, 'data': parser(content)}
+    cache[path] = entry
+
+    return entry
+
+def __Entry(path, parser=None):
+    stat = os.stat(path)
+    statKey = (stat.st_mtime_ns, stat.st_size)
+
+    entry = cache.get(path)
+    if entry is not None and entry['stat'] == statKey and (parser is None or entry['parser'] is parser):
+        return entry
+
+    with lock:
+        entry = cache.get(path)
+        if entry is not None and entry['stat'] == statKey and (parser is None or entry['parser'] is parser):
+            return entry
+
+        if parser is None:
+            if entry is not None:
+                parser = entry['parser']
+            else:
+                parser = loads if path.endswith('.json') else __NoParser
+
+        return __Read(path, parser, statKey)
+
+# cells that pd.read_csv reads as NaN
+missingValues = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+}
+
+def ReadCSV(content, missing=None):
+    lines = csv.reader(io.StringIO(content.decode('utf-8-sig')))
+    header = next(lines, None)
+
+    if header is None:
+        return []
+
+    rows = []
+    for line in lines:
+        # blank lines are skipped, short rows are filled up to the length of the header (same as pandas)
+        if not line:
+            continue
+
+        row = [missing if x in missingValues else x for x in line[:len(header)]]
+        row.extend([missing] * (len(header) - len(row)))
+        rows.append(row)
+
+    return rows
+
+def Load(path, parser=loads):
+    return __Entry(path, parser)['data']
+
+def LoadCopy(path):
+    return copy.deepcopy(Load(path))
+
+def Version(*paths):
+    return tuple(__Entry(path)['version'] for path in paths)
+
+def Hash(*paths):
+    return ''.join(__Entry(path)['hash'].hex() for path in paths)
+
+def __Replace(path, content):
+    tempPath = path + '.tmp'
+
+    with open(tempPath, 'wb') as file:
+        file.write(content)
+
+    os.replace(tempPath, path)
+
+def __StoredHash(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    entry = cache.get(path)
+    if entry is not None and entry['stat'] == (stat.st_mtime_ns, stat.st_size):
+        return entry['hash']
+
+    with open(path, 'rb') as file:
+        return hashlib.blake2b(file.read(), digest_size=16).digest()
+
+def Write(path, content):
+    digest = hashlib.blake2b(content, digest_size=16).digest()
+
+    with lock:
+        # same content, file is not touched (cached copy and version stay the same)
+        if __StoredHash(path) == digest:
+            return False
+
+        __Replace(path, content)
+
+    return True
+
+def Dump(path, data):
+    content = dumps(data, indent=1).encode()
+    digest = hashlib.blake2b(content, digest_size=16).digest()
+
+    with lock:
+        __Replace(path, content)
+
+        # saving the same content does not change the version
+        entry = cache.get(path)
+        version = entry['version'] if entry is not None and entry['hash'] == digest else __NextVersion()
+
+        stat = os.stat(path)
+        cache[path] = {
+            'stat': (stat.st_mtime_ns, stat.st_size),
+            'hash': digest,
+            'version': version,
+            'parser': loads,
+            'data': data
+        }
+
+def Invalidate(path=None):
+    with lock:
+        if path is None:
+            cache.clear()
+        else:
+            cache.pop(path, None)
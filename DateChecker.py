@@ -36,6 +36,9 @@ import Functions
 # |         Lastly, if maxDayDelta provided, checkes whether number of days between startDate and endDate is smaller than maxDayDelta.     |
 # |         If it fails at any step, none is returned.                                                                                     |
 # |                                                                                                                                        |
+# | 4. MonthCheck(monthRAW)                                                                                                                |
+# |     --> monthRAW in the format MMYY (eg. 0224 for Feb 24), returns (month, year) (eg. (2, 2024)), else none is returned                |
+# |                                                                                                                                        |
 # |                                FAILS at rejecting dates very far away from current date                                                |
 # |                                        (eg. 010140 will pass and be returned !!!)                                                      |
 # |                                                                                                                                        |
@@ -94,4 +97,13 @@ def DoubleDate(contArgs, maxDayDelta:int=None, autofillFirst = True, autofillSec
                     startDateDT = 'tooFar'
                     endDateDT = None
     
-    return startDateDT, endDateDT
\ No newline at end of file
+    return startDateDT, endDateDT
+
+def MonthCheck(monthRAW):
+    # checks if month provided is 4 digits
+    if monthRAW is not None and len(monthRAW.strip()) == 4:
+        try:
+            monthDT = datetime.datetime.strptime(monthRAW.strip(), '%m%y')
+            return monthDT.month, monthDT.year
+        except ValueError:
+            return
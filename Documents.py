@@ -0,0 +1,36 @@
+import hashlib
+import StateStore
+from telegram.error import BadRequest
+
+# |===============================================================================================================================|
+# |                                                                                                                               |
+# |                       EXCEL FILES ARE ONLY UPLOADED TO TELEGRAM THE FIRST TIME THEY ARE SENT                                  |
+# |                                                                                                                               |
+# | --> Telegram gives every document that is uploaded a file_id, and a document can be sent again with its file_id (no upload)   |
+# | --> The file_id of every document sent is saved in StateStore (fileIDs), KEY: hash of the file name and the content           |
+# |     (excel files made from the same data are the same bytes, see ExcelProcesser.workbookProperties)                           |
+# | --> If telegram no longer accepts a file_id, it is removed and the document is uploaded again                                 |
+# |                                                                                                                               |
+# | FUNCTIONS:                                                                                                                    |
+# | 1. SendDocument(bot, chatID, content, filename, **kwargs) - same as bot.send_document(chatID, content, filename=filename)     |
+# |    --> content is bytes, kwargs are passed on to bot.send_document (eg. caption)                                              |
+# |                                                                                                                               |
+# |===============================================================================================================================|
+
+def __Hash(content, filename):
+    return hashlib.blake2b(filename.encode() + b'\0' + content, digest_size=16).hexdigest()
+
+async def SendDocument(bot, chatID, content, filename, **kwargs):
+    digest = __Hash(content, filename)
+    fileID = StateStore.FileIDs().get(digest)
+
+    if fileID is not None:
+        try:
+            return await bot.send_document(chatID, fileID, **kwargs)
+        except BadRequest:
+            StateStore.RemoveFileID(digest)
+
+    message = await bot.send_document(chatID, content, filename=filename, **kwargs)
+    StateStore.SetFileID(digest, message.document.file_id)
+
+    return message
@@ -1,11 +1,16 @@
-import Global
+import io
 import re
 import datetime
+import xlsxwriter
+import History
+import DataStore
+import StateStore
 import Functions
-import Scheduled
-import pandas as pd
+import Metrics
+import SheetStore
 import ParadeState as ps
-from ujson import load, dump
+from calendar import monthrange
+from xlsxwriter.utility import xl_pixel_width
 
 # |=========================================================================================================|
 # |                                                                                                         |
@@ -14,12 +19,22 @@ from ujson import load, dump
 # | Functions that start with:                                                                              |
 # | --> Obtain : Generates excel sheet from csv/json files in data folder                                   |
 # | --> Edit   : Receives excel sheets sent by user and rewrites into respective csv/json file to be saved  |
+# | --> ObtainDutyForecastExcel (/df) is written straight with xlsxwriter (constant_memory) into memory,    |
+# |     returns bytes and is kept in ParadeState.resultCache until the data it is made from changes         |
+# | --> pandas (and openpyxl, used by pandas) is only imported inside the Obtain/Edit functions using it,   |
+# |     so /f, /we and /df (and starting the bot) never import it                                           |
 # |                                                                                                         |
 # |=========================================================================================================|
 
+# the same data always gives the same file (xlsxwriter saves the time the file was made, unless it is given),
+# so a file that has not changed can be sent again with its telegram file_id (see Documents.py)
+workbookProperties = {'created': datetime.datetime(2023, 1, 1)}
 
 def ObtainFlightPersonnelExcel(instructions:bool):
+    import pandas as pd
+
     writer = pd.ExcelWriter('data/excel files/out/flightPersonnel.xlsx')
+    writer.book.set_properties(workbookProperties)
     
     if instructions:
         instructionSheet = writer.book.add_worksheet('INSTRUCTIONS')
@@ -40,6 +55,8 @@ def ObtainFlightPersonnelExcel(instructions:bool):
     writer.close()
 
 def EditFlightPersonnelExcel():
+    import pandas as pd
+
     callsignRef = pd.read_excel('data/excel files/in/flightPersonnel.xlsx', sheet_name=['CALLSIGN'])['CALLSIGN'].fillna('NIL')
 
     result = {}
@@ -51,11 +68,9 @@ def EditFlightPersonnelExcel():
         if callsign != 'NIL':
             result[callsign] = sheetName
     
-    with open('data/reference/callsign_ref.json', 'w') as file:
-        dump(result, file, indent=1)
+    DataStore.Dump('data/reference/callsign_ref.json', result)
 
-    with open('data/reference/rank_sorting.json') as file:
-        rankSort = load(file)
+    rankSort = DataStore.Load('data/reference/rank_sorting.json')
 
     flightDF = pd.read_excel('data/excel files/in/flightPersonnel.xlsx', sheet_name=['ALPHA', 'BRAVO', 'OTHERS'])
 
@@ -82,21 +97,15 @@ def EditFlightPersonnelExcel():
         
         result = sorted(result, key=lambda x: (x.get('rankINT'), x.get('nor')), reverse=True)
         
-        with open(f'data/personnel/{flight.lower()}.json', 'w') as file:
-            dump(result, file, indent=1)
-    
-    Scheduled.GetGlobalVariables()
+        DataStore.Dump(f'data/personnel/{flight.lower()}.json', result)
 
-    with open('data/status.json') as file:
-        status = load(file)
-    
-    status['flight personnel files']['time'] = Functions.CurrentDatetime().strftime('%d/%m/%y at %#I:%M %p')
-
-    with open('data/status.json', 'w') as file:
-        dump(status, file, indent=1)
+    StateStore.SetStatus('flight personnel files', time=Functions.CurrentDatetime().strftime('%d/%m/%y at %#I:%M %p'))
 
 def ObtainStatusReferenceExcel(instructions:bool):
+    import pandas as pd
+
     writer = pd.ExcelWriter('data/excel files/out/statusReference.xlsx')
+    writer.book.set_properties(workbookProperties)
 
     if instructions:
         instructionSheet = writer.book.add_worksheet('INSTRUCTIONS')
@@ -110,10 +119,7 @@ def ObtainStatusReferenceExcel(instructions:bool):
     definiteStatus = definiteStatus[:-1]
     definiteStatus.to_excel(writer, sheet_name='DEFINITE STATUS', index=False)
 
-    with open('data/reference/indefinite_status.json') as file:
-        indefiniteStatusDict = load(file)
-
-    indefiniteStatus = pd.DataFrame.from_dict(indefiniteStatusDict, orient='index').reset_index(names=['category'])
+    indefiniteStatus = pd.DataFrame.from_dict(DataStore.Load('data/reference/indefinite_status.json'), orient='index').reset_index(names=['category'])
     indefiniteStatus.to_excel(writer, sheet_name='INDEFINITE STATUS', index=False)
     
     for x in writer.sheets:
@@ -122,6 +128,8 @@ def ObtainStatusReferenceExcel(instructions:bool):
     writer.close()
 
 def EditStatusReferenceExcel():
+    import pandas as pd
+
     status = pd.read_excel(
         'data/excel files/in/statusReference.xlsx',
         sheet_name=['PARADE STATE CATEGORIES', 'MORE DOMINANT STATUS', 'DEFINITE STATUS', 'INDEFINITE STATUS']
@@ -158,94 +166,150 @@ def EditStatusReferenceExcel():
             ]
 
     for key, value in result.items():
-        with open(f'data/reference/{key}.json', 'w') as file:
-            dump(value, file, indent=1)
-    
-    with open('data/status.json') as file:
-        status = load(file)
+        DataStore.Dump(f'data/reference/{key}.json', value)
     
-    status['status files']['time'] = Functions.CurrentDatetime().strftime('%d/%m/%y at %#I:%M %p')
+    # resolved statuses are based on the old reference files
+    ps.ClearStatusTable()
 
-    with open('data/status.json', 'w') as file:
-        dump(status, file, indent=1)
+    StateStore.SetStatus('status files', time=Functions.CurrentDatetime().strftime('%d/%m/%y at %#I:%M %p'))
 
-def ObtainDutyForecastExcel(startDateDT, endDateDT):
-    writer = pd.ExcelWriter('data/excel files/out/dutyForecast.xlsx')
-    format = writer.book.add_format({'bold': True})
+# column width that fits pixels (same as worksheet.autofit(), which does not work in constant_memory mode)
+def __ColumnWidth(pixels):
+    pixels += 7
+
+    if pixels <= 12:
+        return min(pixels / 12, 255)
 
+    return min((pixels - 5) / 7, 255)
+
+# places a table (LIST of rows) into cells (DICT KEY: row | VALUE: DICT KEY: column | VALUE: cell) at startrow, startcol
+def __PlaceTable(cells, table, startrow, startcol):
+    for row, values in enumerate(table):
+        for column, value in enumerate(values):
+            # empty cells are not written
+            if value != '':
+                cells.setdefault(startrow + row, {})[startcol + column] = value
+
+def __DutyForecastWorkbook(startDateDT, endDateDT):
     dataManager = ps.DataManager()
 
+    # KEY: sheet name (date) | VALUE: cells of the sheet
+    # (sheets are in the order they are first used: startDate, the day before startDate, startDate + 1, ..., the day after endDate)
+    sheets = {}
+
     for currentDateRAW, beforeDateRAW, values in dataManager.CombinedDutyForecast(startDateDT, endDateDT):
-        dutyME = pd.DataFrame({
-            '0' : ['OSC', 'SSM', 'PRI LM', 'SEC LM', '', 'DLS', 'TRANSPORT OPERATOR', 'SITE VCOMM'],
-            '1' : [
-                values['dutyPersonnel'][0],
-                values['dutyPersonnel'][1],
-                values['dutyPersonnel'][4],
-                values['dutyPersonnel'][2],
-                values['dutyPersonnel'][5],
-                values['dutyPersonnel'][3],
-                '',
-                values['siteVcomm']
-            ]
-        })
-
-        dutyWC = pd.DataFrame({
-            '0' : ['A-S COORD (G1)', 'A-S CONT (G2)', 'ASTER WC (G3A)'],
-            '1' : [
-                values['weaponControllers'][0],
-                values['weaponControllers'][1],
-                values['weaponControllers'][2]
-            ]
-        })
-
-        standby = pd.DataFrame({
-            '0' : ['OFFICER', 'JUNIOR/SENIOR ADWSS', 'ADWS', 'COMMSEC', 'A-S COORD (G1)', 'A-S CONT (G2)', 'ASTER WC (G3A)', 'SB TO (EQUIPMENT)', 'SB TO (ESCORT)'],
-            '1' : [
-                values['standbyPersonnel'][0],
-                values['standbyPersonnel'][1],
-                values['standbyPersonnel'][2],
-                values['commSec'],
-                values['weaponControllers'][3],
-                values['weaponControllers'][4],
-                values['weaponControllers'][5],
-                '',
-                ''
-            ]
-        })
-        
-        dutyME.to_excel(writer, sheet_name=currentDateRAW, header=False, index=False, startrow=2)
-        dutyWC.to_excel(writer, sheet_name=currentDateRAW, header=False, index=False, startrow=11)
-        dutyME.to_excel(writer, sheet_name=beforeDateRAW, header=False, index=False, startcol=3, startrow=2)
-        standby.to_excel(writer, sheet_name=currentDateRAW, header=False, index=False, startcol=6, startrow=1)
-    
-    for x in writer.sheets:
-        ws = writer.sheets[x]
+        current = sheets.setdefault(currentDateRAW, {0: {0: 'APPT', 1: 'NAME', 3: 'RVAAC', 6: 'STANDBY'}})
+        before = sheets.setdefault(beforeDateRAW, {0: {0: 'APPT', 1: 'NAME', 3: 'RVAAC', 6: 'STANDBY'}})
+
+        dutyME = [
+            ['OSC', values['dutyPersonnel'][0]],
+            ['SSM', values['dutyPersonnel'][1]],
+            ['PRI LM', values['dutyPersonnel'][4]],
+            ['SEC LM', values['dutyPersonnel'][2]],
+            ['', values['dutyPersonnel'][5]],
+            ['DLS', values['dutyPersonnel'][3]],
+            ['TRANSPORT OPERATOR', ''],
+            ['SITE VCOMM', values['siteVcomm']]
+        ]
+
+        dutyWC = [
+            ['A-S COORD (G1)', values['weaponControllers'][0]],
+            ['A-S CONT (G2)', values['weaponControllers'][1]],
+            ['ASTER WC (G3A)', values['weaponControllers'][2]]
+        ]
+
+        standby = [
+            ['OFFICER', values['standbyPersonnel'][0]],
+            ['JUNIOR/SENIOR ADWSS', values['standbyPersonnel'][1]],
+            ['ADWS', values['standbyPersonnel'][2]],
+            ['COMMSEC', values['commSec']],
+            ['A-S COORD (G1)', values['weaponControllers'][3]],
+            ['A-S CONT (G2)', values['weaponControllers'][4]],
+            ['ASTER WC (G3A)', values['weaponControllers'][5]],
+            ['SB TO (EQUIPMENT)', ''],
+            ['SB TO (ESCORT)', '']
+        ]
+
+        __PlaceTable(current, dutyME, 2, 0)
+        __PlaceTable(current, dutyWC, 11, 0)
+        __PlaceTable(before, dutyME, 2, 3)
+        __PlaceTable(current, standby, 1, 6)
+
+    hidden = {Functions.DateConverter(startDateDT - datetime.timedelta(days=1)), Functions.DateConverter(endDateDT + datetime.timedelta(days=1))}
+
+    output = io.BytesIO()
+
+    # constant_memory - every row is written out as soon as the next row is started (so rows are written in order)
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    workbook.set_properties(workbookProperties)
+    bold = workbook.add_format({'bold': True})
+
+    for sheetName, cells in sheets.items():
+        ws = workbook.add_worksheet(sheetName)
+
+        widths = {}
+        for columns in cells.values():
+            for column, value in columns.items():
+                widths[column] = max(widths.get(column, 0), xl_pixel_width(value))
+
+        for column, pixels in widths.items():
+            ws.set_column(column, column, __ColumnWidth(pixels))
+
+        for row in sorted(cells):
+            for column, value in sorted(cells[row].items()):
+                ws.write_string(row, column, value, bold if row == 0 else None)
+
+        if sheetName in hidden:
+            ws.hide()
+
+    workbook.close()
+
+    return output.getvalue()
+
+# returns the duty forecast workbook as bytes (kept in ParadeState.resultCache until the data it is made from changes)
+def ObtainDutyForecastExcel(startDateDT, endDateDT):
+    key = ('df', startDateDT, endDateDT)
 
-        ws.write(0, 0, 'APPT', format)
-        ws.write(0, 1, 'NAME', format)
-        ws.write(0, 3, 'RVAAC', format)
-        ws.write(0, 6, 'STANDBY', format)
-        ws.autofit()
+    # RVAAC of endDateDT is from the day after endDateDT
+    version = ps.ResultVersion(startDateDT, endDateDT + datetime.timedelta(days=1))
+    result = ps.GetResult(key, version)
 
-    writer.sheets[Functions.DateConverter(startDateDT - datetime.timedelta(days=1))].hide()
-    writer.sheets[Functions.DateConverter(endDateDT + datetime.timedelta(days=1))].hide()
+    if result is None:
+        with Metrics.Stage('rendering'):
+            result = __DutyForecastWorkbook(startDateDT, endDateDT)
+        ps.SetResult(key, version, result)
 
-    writer.close()
+    return result
+
+# month, year - month the sheet is for (given with the upload, the sheet itself does not say which month it is)
+# returns FALSE (and nothing is saved) if the sheet does not have a column for every day of the month
+def EditADWExcelSheet(month, year):
+    import pandas as pd
 
-def EditADWExcelSheet():
     adwDF = pd.read_excel('data/excel files/in/adw.xlsx').fillna('NIL')
 
+    # column 0 - slot, column 1 - last day of the previous month, column x + 1 - day x
+    if len(adwDF.columns) < monthrange(year, month)[1] + 2:
+        return False
+
     for column in adwDF.columns:
         adwDF[column] = adwDF[column].str.upper()
         adwDF[column] = adwDF[column].str.strip()
 
     adwDF.to_csv('data/database/adw/adw.csv', index=False)
+    DataStore.Dump(SheetStore.adwMonthPath, {'month': month, 'year': year})
+
+    History.IngestADW(month, year, adwDF.values.tolist())
+
+    return True
 
 def ObtainADWExcelSheet():
+    import pandas as pd
+
     adwDF = pd.read_csv('data/database/adw/adw.csv')
 
     writer = pd.ExcelWriter('data/excel files/out/adw.xlsx')
+    writer.book.set_properties(workbookProperties)
     adwDF.to_excel(writer, sheet_name='ADW', index=False)
     writer.sheets['ADW'].autofit()
     writer.close()
\ No newline at end of file
@@ -0,0 +1,86 @@
+import time
+import httpx
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# |===============================================================================================================================|
+# |                                                                                                                               |
+# |                          ALL REQUESTS TO GOOGLE SHEETS GO THROUGH HERE (used by Functions.py and Scheduled.py)                |
+# |                                                                                                                               |
+# | --> One httpx.Client is shared by everyone, so connections to google are kept open and reused                                 |
+# |     (instead of pd.read_csv(url)/pd.read_html(url) opening a new connection for every sheet)                                  |
+# | --> Every request has a timeout and responses are gzipped                                                                     |
+# | --> Requests that fail because of the connection or because google is busy (429, 5XX) are tried again                        |
+# |     (up to retries times, waiting backoff, 2 x backoff, 4 x backoff, ... seconds in between)                                  |
+# |                                                                                                                               |
+# | FUNCTIONS:                                                                                                                    |
+# | 1. Fetch(url, retries, timeout) - returns content of url as bytes (raises an error if it still fails after retrying)          |
+# | 2. FetchOnce(url)   - Fetch(url) tried once with quickTimeout (for commands, which a user is waiting on)                      |
+# |                       --> retries are only for Scheduled.py, where nobody is waiting                                          |
+# | 3. FetchMany(urls)  - fetches all urls at the same time, returns a list of bytes in the same order as urls                    |
+# |                       (None for urls that failed)                                                                             |
+# | 4. Submit(url)      - starts fetching url in the background and returns a Future (future.result() to get the bytes)           |
+# |                                                                                                                               |
+# | --> A full refresh (/update) now takes about as long as the slowest request, instead of all requests added together           |
+# |                                                                                                                               |
+# |===============================================================================================================================|
+
+timeout = httpx.Timeout(30, connect=10)
+retries = 3
+# for requests a user is waiting on (no retries, fails fast when google cannot be reached)
+quickTimeout = httpx.Timeout(5, connect=2)
+backoff = 0.5
+retryStatusCodes = {429, 500, 502, 503, 504}
+
+shared = {'client': None, 'executor': None}
+sharedLock = threading.Lock()
+
+def __Client():
+    if shared['client'] is None:
+        with sharedLock:
+            if shared['client'] is None:
+                shared['client'] = httpx.Client(
+                    timeout=timeout,
+                    follow_redirects=True,
+                    headers={'Accept-Encoding': 'gzip'},
+                    limits=httpx.Limits(max_connections=10, max_keepalive_connections=10)
+                )
+
+    return shared['client']
+
+def __Executor():
+    if shared['executor'] is None:
+        with sharedLock:
+            if shared['executor'] is None:
+                shared['executor'] = ThreadPoolExecutor(max_workers=10, thread_name_prefix='fetcher')
+
+    return shared['executor']
+
+def Fetch(url, retries=retries, timeout=timeout):
+    for attempt in range(retries + 1):
+        try:
+            response = __Client().get(url, timeout=timeout)
+
+            if response.status_code not in retryStatusCodes or attempt == retries:
+                response.raise_for_status()
+                return response.content
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+
+        time.sleep(backoff * 2 ** attempt)
+
+def FetchOnce(url):
+    return Fetch(url, 0, quickTimeout)
+
+def __FetchOrNone(url):
+    try:
+        return Fetch(url)
+    except httpx.HTTPError:
+        return None
+
+def FetchMany(urls):
+    return list(__Executor().map(__FetchOrNone, urls))
+
+def Submit(url):
+    return __Executor().submit(Fetch, url)
@@ -1,6 +1,9 @@
+import io
 import datetime
-import pandas as pd
-from ujson import load
+import Fetcher
+import DataStore
+import StateStore
+import OverrideIndex
 from pytz import timezone
 
 # |==================================================|
@@ -27,23 +30,41 @@ def timedelta_months(month, year, add):
     new_year = year + ((month - 1) + add) // 12
     return new_month, new_year
 
-# loads in ME/ADW google sheet and returns it as a dataframe
-def csv_to_dataframe(month_num, year, sheet):
-    with open('data/reference/meDF_month_ref.json') as file:
-        month_alpha_ref = load(file)
+# url of ME google sheet (csv of the sheet for the month given, year is 2 digits)
+def csv_url(month_num, year):
+    month_alpha_ref = DataStore.Load('data/reference/meDF_month_ref.json')
+    sheet_name_ref = DataStore.Load('data/reference/sheet_name_ref.json')
 
     # converts months in numbers to months in aphabets
-    month_alpha = month_alpha_ref[month_num - 1]
-
-    # NOTE: ↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓
-    # How this URL was created ↓↓↓ (return statement) (this URL gives you a csv file of the sheet you want)
-    # Original ME_df link: https://docs.google.com/spreadsheets/d/1rXLXxWMSpb8hU_BRuI87jv7wS04tB6yD/edit#gid=1221436461
-    # Spreadsheet ID: 1rXLXxWMSpb8hU_BRuI87jv7wS04tB6yD
-    # Format of URL to get csv file: https://docs.google.com/spreadsheets/d/[Spreadsheet ID]/gviz/tq?tqx=out:[csv/html]&sheet=[Sheet Name]
-    # More info is found here: https://stackoverflow.com/a/33727897
+    # (name found for that month and year by GetmeDFMonthRef if there is one)
+    month_alpha = sheet_name_ref.get(f'{month_num}/20{year}', month_alpha_ref[month_num - 1])
+
+    return sheet_url(month_alpha, f'20{year}')
+
+# NOTE: ↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓
+# How this URL was created ↓↓↓ (return statement) (this URL gives you a csv file of the sheet you want)
+# Original ME_df link: https://docs.google.com/spreadsheets/d/1rXLXxWMSpb8hU_BRuI87jv7wS04tB6yD/edit#gid=1221436461
+# Spreadsheet ID: 1rXLXxWMSpb8hU_BRuI87jv7wS04tB6yD
+# Format of URL to get csv file: https://docs.google.com/spreadsheets/d/[Spreadsheet ID]/gviz/tq?tqx=out:[csv/html]&sheet=[Sheet Name]
+# More info is found here: https://stackoverflow.com/a/33727897
+def sheet_url(month_alpha, year):
+    return f"https://docs.google.com/spreadsheets/d/1rXLXxWMSpb8hU_BRuI87jv7wS04tB6yD/gviz/tq?tqx=out:csv&sheet={month_alpha}%20{year}"
+
+# csv downloaded from google sheets to dataframe (None if it cannot be read)
+# (pandas is only imported here, so /f, /we and /df never load it, see OpenSheet)
+def content_to_dataframe(content):
+    import pandas as pd
+
+    try:
+        return pd.read_csv(io.BytesIO(content)).fillna('NIL')
+    except:
+        return None
+
+# loads in ME/ADW google sheet and returns it as a dataframe
+def csv_to_dataframe(month_num, year, sheet):
     try:
         if sheet == 'me':
-            return pd.read_csv(f"https://docs.google.com/spreadsheets/d/1rXLXxWMSpb8hU_BRuI87jv7wS04tB6yD/gviz/tq?tqx=out:csv&sheet={month_alpha}%2020{year}").fillna('NIL') 
+            return content_to_dataframe(Fetcher.Fetch(csv_url(month_num, year)))
     except:
         return None
     
@@ -51,31 +72,49 @@ def csv_to_dataframe(month_num, year, sheet):
     # elif sheet == 'adw':
     #     return pd.read_csv("https://docs.google.com/spreadsheets/d/1TwTIG7XdT1RRWzm8XCtbuWyKcMMdXwGr/gviz/tq?tqx=out:csv&sheet=" + datetime.datetime(year, month_num, 1).strftime('%b').upper() + f"%20{year}").fillna('NIL')
 
-def OpenSheet(dateDT: datetime.datetime, sheet):
+# loads in ME/ADW sheet and returns it as a LIST of rows (see DataStore.ReadCSV, no pandas)
+def OpenSheet(dateDT: datetime.datetime, sheet, once=False):
     monthINT = int(dateDT.strftime('%#m'))
     yearINT = int(dateDT.strftime('%#y'))
 
     # tries to open csv sheet in storage
-    # if sheet does not exist, download sheet from online and use it
+    # if sheet does not exist, download sheet from online and use it (empty cells are NIL, same as content_to_dataframe)
+    # once: download is only tried once with a short timeout (for commands, so a user is not kept waiting)
     try:
         if sheet == 'me':
-            return pd.read_csv(f'data/database/{sheet}/{sheet}_{monthINT}_{yearINT}.csv')
+            with open(f'data/database/{sheet}/{sheet}_{monthINT}_{yearINT}.csv', 'rb') as file:
+                return DataStore.ReadCSV(file.read())
         elif sheet == 'adw':
-            return pd.read_csv('data/database/adw/adw.csv')
+            with open('data/database/adw/adw.csv', 'rb') as file:
+                return DataStore.ReadCSV(file.read())
     except:
-        return csv_to_dataframe(monthINT, yearINT, sheet)
+        try:
+            if sheet == 'me':
+                return DataStore.ReadCSV((Fetcher.FetchOnce if once else Fetcher.Fetch)(csv_url(monthINT, yearINT)), 'NIL')
+        except:
+            return None
+
+# maps are only made again when personnel files are changed
+# !!! returned map is shared, DO NOT change it !!!
+mapCache = {}
 
 def ObtainMap(key, value):
+    personnelPaths = [f'data/personnel/{flight}.json' for flight in ['alpha', 'bravo', 'others']]
+    version = DataStore.Version(*personnelPaths)
+
+    cached = mapCache.get((key, value))
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
     resultMap = {}
 
-    for flight in ['alpha', 'bravo', 'others']:
-        with open(f'data/personnel/{flight}.json') as flightJson:
-            flightList = load(flightJson)
-        
-        for x in flightList:
+    for path in personnelPaths:
+        for x in DataStore.Load(path):
             if x[key] != 'NIL':
                 resultMap[x[key]] = x[value]
     
+    mapCache[(key, value)] = (version, resultMap)
+    
     return resultMap
 
 def ObtainResultDict(sheetToDisplay, sheet):
@@ -103,21 +142,11 @@ def OverrideListCategoriser(mergedCells=True, psOverride=True):
     ref = {'sheetToDisplay': ObtainMap('sheetName', 'displayNoStatus')}
     result = []
 
-    fileName = [
-        'mergedCells',
-        'psOverride',
-        'status'
-    ]
-
-    filePath = [
-        'data/override/merged_cells.json',
-        'data/override/parade_state_override.json',
-        'data/status.json'
-    ]
-
-    for name, path in zip(fileName, filePath):
-        with open(path) as file:
-            ref[name] = load(file)
+    ref['mergedCells'] = DataStore.Load('data/override/merged_cells.json')
+    ref['status'] = StateStore.Status()
+    
+    # expired overrides are not shown
+    ref['psOverride'] = OverrideIndex.Open().Active(CurrentDatetime().replace(tzinfo=None), 'psOverride')
     
     if mergedCells:
         result.append('<<< MERGED CELLS >>>\n')
@@ -129,8 +158,7 @@ def OverrideListCategoriser(mergedCells=True, psOverride=True):
     return result
 
 def RationsListCategoriser():
-    with open('data/override/rations.json') as file:
-        rations = load(file)
+    rations = StateStore.Rations()
     
     resultStr = '<<< RATIONS LIST >>>\n\n'
     for x in rations:
@@ -141,9 +169,36 @@ def RationsListCategoriser():
     
     return resultStr
 
+# splits text into messages of at most limit characters (telegram does not send messages longer than 4096 characters)
+# text is only split at the end of a line (unless one line is longer than limit)
+def SplitMessage(text, limit=4096):
+    messages = []
+    current = None
+
+    for line in text.split('\n'):
+        while len(line) > limit:
+            if current is not None:
+                messages.append(current)
+                current = None
+
+            messages.append(line[:limit])
+            line = line[limit:]
+
+        if current is None:
+            current = line
+        elif len(current) + 1 + len(line) <= limit:
+            current += '\n' + line
+        else:
+            messages.append(current)
+            current = line
+
+    if current is not None:
+        messages.append(current)
+
+    return messages
+
 def StatusListCategoriser():
-    with open('data/status.json') as file:
-        status = load(file)
+    status = StateStore.Status()
     
     resultStr = '<<< STATUS LIST >>>\n\n'
 
@@ -0,0 +1,242 @@
+import os
+import re
+import sqlite3
+import hashlib
+import datetime
+import threading
+import DataStore
+from calendar import monthrange
+
+# |===============================================================================================================================|
+# |                                                                                                                               |
+# |                       EVERY ME MONTH AND ADW MONTH EVER DOWNLOADED/UPLOADED, KEPT IN data/history.db                          |
+# |                                                                                                                               |
+# | --> data/database/me only has the month before, current month and month after, so any other month had to be downloaded       |
+# |     again while someone was waiting for /f, /we or /df. Every month is now kept here and read with one indexed query.         |
+# |                                                                                                                               |
+# | TABLES:                                                                                                                       |
+# | 1. months     - (month, year, hash of the csv, number of days) of every ME month kept                                         |
+# | 2. meRows     - (month, year, row, name) column 0 of every row of the ME sheet                                                |
+# | 3. meStatuses - (date ordinal, row, sheetName, rawStatus) status of every row on every day of the month                       |
+# |                 --> indexed by (date ordinal, row) and (sheetName, date ordinal)                                              |
+# | 4. adw        - (date ordinal, slot, cell, own) G1, G2, G3A, G3S, G1 SB, ... of every day (uppercase, whitespace removed)   |
+# |                 --> own is 0 if the day was taken from column 1 (last day of the previous month) of the next month            |
+# |                                                                                                                               |
+# | FUNCTIONS:                                                                                                                    |
+# | 1. IngestDatabase()            - adds every csv in data/database/me that is new or has changed (compared by hash)             |
+# |                                  (ran after DownloadDatabase() and when run.py is ran)                                        |
+# | 2. IngestMonth(month, year, rows) - replaces the month with rows (rows of the ME sheet, same as SheetStore.SheetRows.rows)     |
+# | 3. IngestADW(month, year, rows)   - replaces the adw of the month with rows (rows of adw.csv)                                  |
+# |                                  --> column 1 (last day of the previous month) never replaces the previous month's own adw    |
+# | 4. MonthRows(monthKeys)        - DICT KEY: (month, year) | VALUE: rows of the ME sheet (column x of a row is day x)           |
+# |                                  --> all months are read with ONE query over the date ordinals, months not kept are left out  |
+# | 5. ADWDays()                   - DICT KEY: date ordinal | VALUE: LIST of cells (G1, G2, G3A, G3S, G1 SB, ...)                 |
+# | 6. Hash(month, year)           - hash of the csv the month was ingested from (hex string, None if not kept)                   |
+# | 7. Version(month, year)        - version of the month (None if month is not kept), changes every time the month is ingested   |
+# | 8. ADWVersion()                - version of the adw table                                                                     |
+# |                                                                                                                               |
+# |===============================================================================================================================|
+
+databasePath = 'data/history.db'
+
+schema = '''
+CREATE TABLE IF NOT EXISTS months (
+    month INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    hash BLOB,
+    days INTEGER NOT NULL,
+    PRIMARY KEY (month, year)
+);
+CREATE TABLE IF NOT EXISTS meRows (
+    month INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    name,
+    PRIMARY KEY (month, year, row)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meStatuses (
+    ordinal INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    sheetName,
+    rawStatus,
+    PRIMARY KEY (ordinal, row)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS meStatusesName ON meStatuses (sheetName, ordinal);
+CREATE TABLE IF NOT EXISTS adw (
+    ordinal INTEGER NOT NULL,
+    slot INTEGER NOT NULL,
+    cell TEXT,
+    own INTEGER NOT NULL,
+    PRIMARY KEY (ordinal, slot)
+) WITHOUT ROWID;
+'''
+
+state = {'db': None}
+lock = threading.RLock()
+versionCounter = [0]
+versions = {}
+
+def __Bump(key):
+    versionCounter[0] += 1
+    versions[key] = versionCounter[0]
+
+def __Database():
+    if state['db'] is None:
+        with lock:
+            if state['db'] is None:
+                db = sqlite3.connect(databasePath, check_same_thread=False, isolation_level=None)
+                db.execute('PRAGMA journal_mode=WAL')
+                db.execute('PRAGMA synchronous=NORMAL')
+                db.executescript(schema)
+
+                for month, year in db.execute('SELECT month, year FROM months').fetchall():
+                    __Bump((month, year))
+                __Bump('adw')
+
+                state['db'] = db
+
+    return state['db']
+
+def __Write(func):
+    db = __Database()
+
+    with lock:
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            result = func(db)
+            db.execute('COMMIT')
+        except:
+            db.execute('ROLLBACK')
+            raise
+
+    return result
+
+def __Ordinals(month, year):
+    firstOrdinal = datetime.date(year, month, 1).toordinal()
+    return firstOrdinal, firstOrdinal + monthrange(year, month)[1] - 1
+
+def __SheetName(name):
+    return name.upper().strip() if isinstance(name, str) else name
+
+def IngestMonth(month, year, rows, digest=None):
+    days = monthrange(year, month)[1]
+    firstOrdinal, lastOrdinal = __Ordinals(month, year)
+
+    def Replace(db):
+        db.execute('DELETE FROM meRows WHERE month = ? AND year = ?', (month, year))
+        db.execute('DELETE FROM meStatuses WHERE ordinal BETWEEN ? AND ?', (firstOrdinal, lastOrdinal))
+
+        db.executemany('INSERT INTO meRows (month, year, row, name) VALUES (?, ?, ?, ?)', [(month, year, x, row[0]) for x, row in enumerate(rows)])
+        db.executemany(
+            'INSERT INTO meStatuses (ordinal, row, sheetName, rawStatus) VALUES (?, ?, ?, ?)',
+            [(firstOrdinal + day - 1, x, __SheetName(row[0]), row[day]) for x, row in enumerate(rows) for day in range(1, min(days + 1, len(row)))]
+        )
+        db.execute('INSERT OR REPLACE INTO months (month, year, hash, days) VALUES (?, ?, ?, ?)', (month, year, digest, days))
+
+    __Write(Replace)
+
+    with lock:
+        __Bump((month, year))
+
+def IngestDatabase(folder='data/database/me'):
+    db = __Database()
+    with lock:
+        hashes = {(month, year): digest for month, year, digest in db.execute('SELECT month, year, hash FROM months').fetchall()}
+    ingested = []
+
+    for file in os.scandir(folder):
+        match = re.fullmatch(r'me_(\d+)_(\d+)\.csv', file.name)
+        if not match:
+            continue
+
+        month, year = int(match[1]), 2000 + int(match[2])
+
+        with open(file.path, 'rb') as csvFile:
+            content = csvFile.read()
+
+        digest = hashlib.blake2b(content, digest_size=16).digest()
+        if hashes.get((month, year)) == digest:
+            continue
+
+        IngestMonth(month, year, DataStore.ReadCSV(content), digest)
+        ingested.append((month, year))
+
+    return ingested
+
+def IngestADW(month, year, rows):
+    firstOrdinal, lastOrdinal = __Ordinals(month, year)
+
+    def Replace(db):
+        db.execute('DELETE FROM adw WHERE ordinal BETWEEN ? AND ?', (firstOrdinal, lastOrdinal))
+
+        # column 1 - last day of the previous month, column x + 1 - day x
+        # (own is 0 for column 1, so it never replaces a day added by the previous month itself)
+        for column in range(1, min(len(rows[0]) if rows else 0, lastOrdinal - firstOrdinal + 3)):
+            db.executemany(
+                'INSERT INTO adw (ordinal, slot, cell, own) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (ordinal, slot) DO UPDATE SET cell = excluded.cell, own = excluded.own WHERE excluded.own >= adw.own',
+                [(firstOrdinal + column - 2, slot, str(row[column]).upper().strip(), int(column > 1)) for slot, row in enumerate(rows)]
+            )
+
+    __Write(Replace)
+
+    with lock:
+        __Bump('adw')
+
+def MonthRows(monthKeys):
+    monthKeys = [x for x in monthKeys if Version(*x) is not None]
+    if not monthKeys:
+        return {}
+
+    db = __Database()
+    result = {}
+    rowsOfOrdinal = {}
+
+    with lock:
+        for month, year in monthKeys:
+            names = db.execute('SELECT name FROM meRows WHERE month = ? AND year = ? ORDER BY row', (month, year)).fetchall()
+            days = monthrange(year, month)[1]
+
+            result[(month, year)] = [[x[0]] + [None] * days for x in names]
+
+            firstOrdinal, lastOrdinal = __Ordinals(month, year)
+            for ordinal in range(firstOrdinal, lastOrdinal + 1):
+                rowsOfOrdinal[ordinal] = (result[(month, year)], ordinal - firstOrdinal + 1)
+
+        statuses = db.execute(
+            'SELECT ordinal, row, rawStatus FROM meStatuses WHERE ordinal BETWEEN ? AND ?',
+            (min(rowsOfOrdinal), max(rowsOfOrdinal))
+        ).fetchall()
+
+    for ordinal, row, rawStatus in statuses:
+        if ordinal in rowsOfOrdinal:
+            rows, day = rowsOfOrdinal[ordinal]
+            rows[row][day] = rawStatus
+
+    return result
+
+def ADWDays():
+    db = __Database()
+    days = {}
+
+    with lock:
+        for ordinal, slot, cell in db.execute('SELECT ordinal, slot, cell FROM adw ORDER BY ordinal, slot').fetchall():
+            days.setdefault(ordinal, []).append(cell)
+
+    return days
+
+def Hash(month, year):
+    db = __Database()
+
+    with lock:
+        row = db.execute('SELECT hash FROM months WHERE month = ? AND year = ?', (month, year)).fetchone()
+
+    return row[0].hex() if row is not None and row[0] is not None else None
+
+def Version(month, year):
+    __Database()
+    return versions.get((month, year))
+
+def ADWVersion():
+    __Database()
+    return versions['adw']
@@ -0,0 +1,243 @@
+import os
+import time
+import bisect
+import functools
+import threading
+import Profiler
+from telegram.request import HTTPXRequest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# |=============================================================================================================================|
+# |                                                                                                                             |
+# |                        HOW LONG EVERY COMMAND AND SCHEDULED JOB TAKES (AND WHERE THE TIME GOES)                             |
+# |                                                                                                                             |
+# | --> Every handler in run.py and every job in Scheduled.py is timed, errors are counted                                      |
+# | --> Parts of a command are timed on their own as stages:                                                                    |
+# |     --> sheet load        - ME sheets and their layout (SheetStore.OpenME/OpenMEs/Layout in ParadeState)                    |
+# |     --> status resolution - sheetStatus of every person turned into the parade state categories (__LoadAll/__LoadRange)     |
+# |     --> rendering         - text of the parade state and the duty forecast workbook                                         |
+# |     --> telegram send     - every request made to telegram (except getUpdates), see TimedRequest                            |
+# |     --> stages can be inside other stages (eg. sheet load inside status resolution), the time of the inner stage is only    |
+# |         counted once (for the inner stage), so the stages of a command add up to at most the time of the command            |
+# | --> Only counters and fixed buckets are kept (no list of every request), so timing costs about a microsecond                |
+# |                                                                                                                             |
+# | Settings (from .env, optional):                                                                                             |
+# | --> METRICS_PORT - metrics are served at http://127.0.0.1:METRICS_PORT/metrics (default 9464, 0 to turn off)                |
+# | --> ADMIN_IDS    - chat IDs (comma separated) that can use /metrics                                                         |
+# |                                                                                                                             |
+# | FUNCTIONS:                                                                                                                  |
+# | 1. Handler(func)          - decorator for async handlers in run.py (bot_handler_seconds, bot_handler_errors_total)          |
+# | 2. Job(func)              - decorator for async jobs in Scheduled.py (bot_job_seconds, bot_job_errors_total)                |
+# |    --> both also profile a fraction of calls (Profiler.Sample, see PROFILE_SAMPLE_RATE in Profiler.py)                      |
+# | 3. Stage(name)            - with Stage('rendering'): ... (bot_stage_seconds, bot_stage_errors_total)                        |
+# |    --> NEVER await inside a Stage, stages are kept per thread (ran inside Workers.Run or without awaiting)                  |
+# | 4. Observe(name, label, seconds) / Count(name, label) - adds to a histogram / counter below                                 |
+# | 5. Render()               - all metrics in prometheus text format                                                           |
+# | 6. Summary()              - short summary of the metrics (sent by /metrics)                                                 |
+# | 7. Serve()                - serves Render() on METRICS_PORT (in a thread, only on 127.0.0.1)                                |
+# | 8. IsAdmin(chatID)        - whether chatID is in ADMIN_IDS                                                                  |
+# |                                                                                                                             |
+# | CLASS TimedRequest (Inherited from telegram.request.HTTPXRequest):                                                          |
+# | --> used in ApplicationBuilder().request(), times every request to telegram as the "telegram send" stage                    |
+# |     --> give it connection_pool_size=256 (HTTPXRequest() has 1 connection, ApplicationBuilder's default has 256)            |
+# |                                                                                                                             |
+# |=============================================================================================================================|
+
+buckets = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+# KEY: name | VALUE: (type, label, help)
+metrics = {
+    'bot_handler_seconds': ('histogram', 'handler', 'Time taken by each handler in run.py'),
+    'bot_handler_errors_total': ('counter', 'handler', 'Errors raised by each handler in run.py'),
+    'bot_job_seconds': ('histogram', 'job', 'Time taken by each scheduled job'),
+    'bot_job_errors_total': ('counter', 'job', 'Errors raised by each scheduled job'),
+    'bot_stage_seconds': ('histogram', 'stage', 'Time taken by each stage (time of inner stages not included)'),
+    'bot_stage_errors_total': ('counter', 'stage', 'Errors raised inside each stage')
+}
+
+# KEY: name | VALUE: DICT KEY: label value | VALUE: [LIST count of each bucket (+Inf last), sum] (histogram) or count (counter)
+values = {x: {} for x in metrics}
+lock = threading.Lock()
+stages = threading.local()
+server = {'server': None}
+
+def Observe(name, label, seconds):
+    with lock:
+        value = values[name].get(label)
+
+        if value is None:
+            value = values[name][label] = [[0] * (len(buckets) + 1), 0]
+
+        value[0][bisect.bisect_left(buckets, seconds)] += 1
+        value[1] += seconds
+
+def Count(name, label):
+    with lock:
+        values[name][label] = values[name].get(label, 0) + 1
+
+class Stage:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        if not hasattr(stages, 'stack'):
+            stages.stack = []
+
+        # [start, time of inner stages]
+        stages.stack.append([time.perf_counter(), 0])
+        return self
+
+    def __exit__(self, errorType, error, traceback):
+        start, inner = stages.stack.pop()
+        seconds = time.perf_counter() - start
+
+        if stages.stack:
+            stages.stack[-1][1] += seconds
+
+        Observe('bot_stage_seconds', self.name, seconds - inner)
+        if errorType is not None:
+            Count('bot_stage_errors_total', self.name)
+
+def __Timed(func, histogram, counter):
+    @functools.wraps(func)
+    async def Timed(*args, **kwargs):
+        start = time.perf_counter()
+
+        try:
+            with Profiler.Sample(func.__name__):
+                return await func(*args, **kwargs)
+        except Exception:
+            Count(counter, func.__name__)
+            raise
+        finally:
+            Observe(histogram, func.__name__, time.perf_counter() - start)
+
+    return Timed
+
+def Handler(func):
+    return __Timed(func, 'bot_handler_seconds', 'bot_handler_errors_total')
+
+def Job(func):
+    return __Timed(func, 'bot_job_seconds', 'bot_job_errors_total')
+
+def __Label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def __Number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+# copy of values, so the lock is not held while the text is made
+def __Snapshot():
+    with lock:
+        return {name: {label: [list(x[0]), x[1]] if isinstance(x, list) else x for label, x in value.items()} for name, value in values.items()}
+
+def Render():
+    snapshot = __Snapshot()
+
+    lines = []
+    for name, (metricType, labelName, description) in metrics.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {metricType}')
+
+        for label, value in sorted(snapshot[name].items()):
+            labels = f'{labelName}="{__Label(label)}"'
+
+            if metricType == 'counter':
+                lines.append(f'{name}{{{labels}}} {value}')
+                continue
+
+            total = 0
+            for bound, count in zip(buckets + ['+Inf'], value[0]):
+                total += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {total}')
+
+            lines.append(f'{name}_sum{{{labels}}} {__Number(value[1])}')
+            lines.append(f'{name}_count{{{labels}}} {total}')
+
+    return '\n'.join(lines) + '\n'
+
+# upper bound of the bucket the q quantile falls in
+def __Quantile(counts, q):
+    target = q * sum(counts)
+    total = 0
+
+    for bound, count in zip(buckets, counts):
+        total += count
+        if total >= target:
+            return f'{bound}s'
+
+    return f'>{buckets[-1]}s'
+
+def Summary():
+    snapshot = __Snapshot()
+
+    sections = []
+    for title, histogram, counter in [
+        ('COMMANDS', 'bot_handler_seconds', 'bot_handler_errors_total'),
+        ('JOBS', 'bot_job_seconds', 'bot_job_errors_total'),
+        ('STAGES', 'bot_stage_seconds', 'bot_stage_errors_total')
+    ]:
+        lines = [f'{title}:']
+
+        # slowest in total first
+        for label, (counts, seconds) in sorted(snapshot[histogram].items(), key=lambda x: -x[1][1]):
+            count = sum(counts)
+            lines.append(
+                f'{label} - {count}x, avg {seconds / count:.3f}s, p95 <= {__Quantile(counts, 0.95)}, '
+                f'errors {snapshot[counter].get(label, 0)}'
+            )
+
+        if len(lines) == 1:
+            lines.append('nothing yet')
+
+        sections.append('\n'.join(lines))
+
+    return '\n\n'.join(sections)
+
+class __MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+
+        content = Render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+def Serve():
+    port = int(os.getenv('METRICS_PORT', 9464))
+
+    if port == 0 or server['server'] is not None:
+        return server['server']
+
+    server['server'] = ThreadingHTTPServer(('127.0.0.1', port), __MetricsRequestHandler)
+    threading.Thread(target=server['server'].serve_forever, name='metrics', daemon=True).start()
+
+    return server['server']
+
+def IsAdmin(chatID):
+    return str(chatID) in [x.strip() for x in os.getenv('ADMIN_IDS', '').split(',') if x.strip()]
+
+class TimedRequest(HTTPXRequest):
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        start = time.perf_counter()
+
+        try:
+            code, payload = await super().do_request(url, method, request_data, *args, **kwargs)
+        except Exception:
+            Count('bot_stage_errors_total', 'telegram send')
+            raise
+        finally:
+            Observe('bot_stage_seconds', 'telegram send', time.perf_counter() - start)
+
+        # eg. 403 (bot blocked) is returned here, and only raised after this
+        if code >= 400:
+            Count('bot_stage_errors_total', 'telegram send')
+
+        return code, payload
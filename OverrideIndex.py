@@ -0,0 +1,95 @@
+import bisect
+import datetime
+import DataStore
+import StateStore
+import Functions
+
+# |==============================================================================================================================|
+# |                                                                                                                              |
+# |                    DATE INDEX OF data/override/merged_cells.json AND THE OVERRIDES IN StateStore.py                          |
+# |                                                                                                                              |
+# | --> Open() returns the index, which is only built again when merged_cells.json or the overrides change                                |
+# |     (dates in the files are only converted with strptime once, when the index is built)                                      |
+# |                                                                                                                              |
+# | CLASS OverrideIndex AND ITS ATTRIBUTES:                                                                                      |
+# | --> LIST entries - (startDate ordinal, endDate ordinal, source, entry) of every entry                                        |
+# |     --> source is 'mergedCells' or 'psOverride'                                                                              |
+# |     --> ordered as mergedCells + psOverride (later entries override earlier entries, same as before)                         |
+# | --> LIST boundaries - sorted ordinals where an entry starts or where an entry has just ended (endDate + 1)                   |
+# | --> LIST segments - segments[i] has the indexes of entries covering every date from boundaries[i] to boundaries[i + 1] - 1   |
+# |                                                                                                                              |
+# | FUNCTIONS:                                                                                                                   |
+# | 1. Covering(dateDT)              - entries covering dateDT (binary search for the segment, then the segment is returned)     |
+# | 2. Overlapping(startDT, endDT)   - (startDate ordinal, endDate ordinal, entry) of entries covering any date in the range      |
+# | 3. Active(nowDT, source)         - entries from source that have not expired                                                 |
+# | 4. Expired(nowDT, source)        - entries from source that have expired (endDate is before nowDT)                           |
+# |                                                                                                                              |
+# | --> Expired entries are never returned by Covering/Overlapping for future dates, and are skipped by Active,                  |
+# |     so they do not need to be removed from the files every day                                                               |
+# |                                                                                                                              |
+# |==============================================================================================================================|
+
+class OverrideIndex:
+    def __init__(self, mergedCells, psOverride):
+        self.entries = []
+
+        for source, overrideList in [('mergedCells', mergedCells), ('psOverride', psOverride)]:
+            for x in overrideList:
+                self.entries.append((
+                    Functions.DateConverter(x['startDate']).toordinal(),
+                    Functions.DateConverter(x['endDate']).toordinal(),
+                    source,
+                    x
+                ))
+
+        self.boundaries = sorted({x[0] for x in self.entries} | {x[1] + 1 for x in self.entries})
+        self.segments = []
+
+        # sweeps through the boundaries, keeping track of which entries are covering the current segment
+        starting = {}
+        for i, x in enumerate(self.entries):
+            starting.setdefault(x[0], []).append(i)
+
+        active = set()
+        for boundary in self.boundaries:
+            active = {i for i in active if self.entries[i][1] >= boundary}
+            active.update(starting.get(boundary, []))
+            self.segments.append(sorted(active))
+
+    def __Segment(self, ordinal):
+        return bisect.bisect_right(self.boundaries, ordinal) - 1
+
+    def Covering(self, dateDT):
+        segment = self.__Segment(dateDT.toordinal())
+
+        if segment < 0:
+            return []
+
+        return [self.entries[i][3] for i in self.segments[segment]]
+
+    def Overlapping(self, startDT, endDT):
+        firstSegment = max(self.__Segment(startDT.toordinal()), 0)
+        lastSegment = self.__Segment(endDT.toordinal())
+
+        indexes = set()
+        for segment in range(firstSegment, lastSegment + 1):
+            indexes.update(self.segments[segment])
+
+        return [(self.entries[i][0], self.entries[i][1], self.entries[i][3]) for i in sorted(indexes)]
+
+    def Active(self, nowDT, source):
+        return [x[3] for x in self.entries if x[2] == source and datetime.datetime.fromordinal(x[1]) > nowDT]
+
+    def Expired(self, nowDT, source):
+        return [x[3] for x in self.entries if x[2] == source and datetime.datetime.fromordinal(x[1]) <= nowDT]
+
+indexCache = {'version': None, 'index': None}
+
+def Open():
+    version = DataStore.Version('data/override/merged_cells.json') + StateStore.Version('overrides')
+
+    if indexCache['version'] != version:
+        indexCache['index'] = OverrideIndex(DataStore.Load('data/override/merged_cells.json'), StateStore.Overrides())
+        indexCache['version'] = version
+
+    return indexCache['index']
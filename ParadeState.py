@@ -1,8 +1,14 @@
-import Global
 import re
 import datetime
+import threading
+import DataStore
+import StateStore
 import Functions
-from ujson import load
+import Metrics
+import SheetStore
+import OverrideIndex
+import numpy as np
+from collections import OrderedDict
 
 # |==================================================================================================================================================|
 # |                                                                                                                                                  |
@@ -15,21 +21,24 @@ from ujson import load
 # |     --> DATETIME dateDT - date in datetime variable type                                                                                         |
 # |     --> STR dateRAW - date in the format DDMMYY (eg. 010124)                                                                                     |
 # |     --> INT day - day taken from dateRAW                                                                                                         |
-# |     --> LIST WCrange - represents the rows to obtain adw in adwDF                                                                                |
+# |     --> LIST WCrange - represents the rows to obtain adw in adwIndex                                                                             |
 # |         --> G1, G2, G3A: /f and /df                                                                                                              |
 # |         --> G1, G2, G3A, G1 SB, G2 SB, G3A SB: /we                                                                                               |
-# |     --> DATAFRAME adwDF - file loaded from data/database/adw/adw.csv as a dataframe                                                              |
+# |     --> ADWINDEX adwIndex - data/database/adw/adw.csv already split into callsigns, from SheetStore.OpenADWIndex()                               |
+# |         --> days kept in History.py are used first, other days are taken from adw.csv (column day + 1)                                           |
 # |         --> contains callsign of weapon operator doing duty on which day                                                                         |
 # |         --> one month for one sheet                                                                                                              |
-# |     --> DATAFRAME meDF - file loaded from data/database/me/(file on month based on date given)                                                   |
+# |     --> MONTHSHEET meSheet - month based on date given from SheetStore.OpenME(dateDT) (History.py, else data/database/me)                        |
 # |         --> taken from ME_df google sheets directly                                                                                              |
+# |         --> sheets are parsed once and kept in memory until the csv file changes (see SheetStore.py)                                             |
+# |     --> DICT meSheets - KEY: (month, year) | VALUE: MONTHSHEET, sheets already opened by this DataManager                                        |
 # |     --> LIST personnel - contains multiple person classes                                                                                        |
 # |     --> DICT categorisedPersonnel - each person is placed in their respective category                                                           |
 # |         --> KEY: CATEGORY (eg. PRESENT, OFF, MC, ...)                                                                                            |
 # |         --> VALUE: LIST of person classes with the same category                                                                                 |
 # |     --> DICT bottomCategorised - contains personnel required for duty crew, standby crew and adw (G1, G2, G3A)                                   |
-# |     --> DICT ref - all files loaded in from data/reference                                                                                       |
-# |     --> STR cos - rank + name of personnel generating the parade state, provided in data/reference/username_ref.json                             |
+# |     --> DICT ref - files loaded in from data/reference (rations and usernames are from StateStore.py)                                            |
+# |     --> STR cos - rank + name of personnel generating the parade state, provided in StateStore.Users()                                           |
 # |                                                                                                                                                  |
 # | 2. Person (Inherited from Status class)                                                                                                          |
 # |     --> INT rankINT - INT obtained from reference/rank_sorting.json based on person rank                                                         |
@@ -40,7 +49,7 @@ from ujson import load
 # |     --> STR displayNoStatus - person represented in parade state message (eg. 3SG BOB (CPC))                                                     |
 # |                                                                                                                                                  |
 # | 3. Status                                                                                                                                        |
-# |     --> LIST/DICT definiteStatus/indefiniteStatus/moreDominantStatus - reference of respective variable in ref (from DataManager)                |
+# |     --> STATUSTABLE statusTable - shared StatusTable (ref['statusTable'] from DataManager)                                                       |
 # |     --> STR sheetStatus - status on ME_df                                                                                                        |
 # |         --> trailing and leading whitespaces REMOVED                                                                                             |
 # |         --> extra whitespaces between slashes REMOVED (eg. OFF / SB --> OFF/SB)                                                                  |
@@ -52,6 +61,13 @@ from ujson import load
 # |         --> determined in function LoadFUllStatus(self)                                                                                          |
 # |     --> BOOL standby/duty - if TRUE personnel is on standby/duty respectively                                                                    |
 # |                                                                                                                                                  |
+# | 4. StatusTable                                                                                                                                   |
+# |     --> Built from definite_status.json, indefinite_status.json and more_dominant_status.json by LoadStatusTable()                               |
+# |     --> DICT normalised - KEY: rawSheetStatus | VALUE: sheetStatus                                                                               |
+# |     --> DICT resolved - KEY: sheetStatus | VALUE: (displayStatus, category, standby, duty)                                                       |
+# |     --> The status vocabulary is tiny, so every sheetStatus is only resolved once and reused for every person on every date.                     |
+# |         The table is rebuilt only when one of the 3 files is modified (or after ClearStatusTable() in EditStatusReferenceExcel)                  |
+# |                                                                                                                                                  |
 # |                                                       LOGIC BEHIND HOW IT WORKS                                                                  |
 # |                                                                                                                                                  |
 # |                         *** def __LoadAll(self, date, WCstandby=False) is the MAIN function !!!!!! ***                                           |
@@ -66,9 +82,9 @@ from ujson import load
 # |     --> def __LoadADW(self, nameStatus) - def WeaponControllers() runs and sheetStatus of adw assigned                                           |
 # |         --> This places adw's on HFD/R (indicating officer is on duty) or \\ (indicating officer is on changeover)                               |
 # |             as officers (fit to be weapon controllers) do not put their duty on ME_df but on another sheet !!! ༼ ಠ益ಠ ༽ ╭∩╮                      |
-# |         2.1. For the day before dateDT, adw's are taken from adwDF, split and subsequently placed in a list                                      |
+# |         2.1. For the day before dateDT, adw's are taken from adwIndex (already split when the index is built)                                    |
 # |              For example if G1 is FLARE/GUNDAM, G1 is split into FLARE and GUNDAM and these 2 elements are added to the list                     |
-# |         2.2. If any of the callsigns in the list in (1) is present in ref['callsign'],                                                           |
+# |         2.2. If any of the callsigns in the list in (1) is present in callsign_ref.json (dictionary lookup in adwIndex),                         |
 # |              personnel's sheetName will be assigned the sheetStatus "\\" (meaning changeover)                                                    |
 # |              (honestly anything can be used but it needs to be added to definite_status.json)                                                    |
 # |         2.3. Steps 1 and 2 is repeated but for dateDT. personnel are given the sheetStatus                                                       |
@@ -77,6 +93,7 @@ from ujson import load
 # |              provided that these callsigns are in callsign_ref.json)                                                                             |
 # |     --> def __LoadOverrideLists(self, nameStatus) - loads in sheetStatus from overrides (merged_cells.json and parade_state_override.json)       |
 # |         --> if dateDT is between startDate and endDate a personnel in override files, personnel is given his respective sheetStatus              |
+# |         --> entries covering dateDT are found with OverrideIndex.Open().Covering(dateDT) (see OverrideIndex.py)                                  |
 # |                                                                                                                                                  |
 # |     *** OverrideList WILL ALWAYS BE THE FINAL SHEETSTATUS OF THE PERSON REGARDLESS OF WHAT SHEETSTATUS THE PERSONNEL HAS IN meDF AND adwDF ***   |
 # |                                                                                                                                                  |
@@ -86,7 +103,7 @@ from ujson import load
 # |    During initialisation of a person object, a status object is also initialised. Below shows the steps for initialising a status object:        |
 # |     4.1.  If personnel sheetName is present in nameStatus in (2), personnel will have be given their sheetStatus, else it will be "UNKNOWN"      |
 # |     4.2a. If fullPS is TRUE (/f is ran):                                                                                                         |
-# |         4.2a.1. For personnels' with sheetName present in ref["callsign"] and not present in ME_df,                                              |
+# |         4.2a.1. For personnels' with sheetName present in callsign_ref.json and not present in ME_df,                                            |
 # |                 they will be given the sheetStatus of NIL (representing PRESENT)                                                                 |
 # |                 (this is so that personnel like OC are marked present if they are not on duty/changeover and not unknown)                        |
 # |         4.2a.2. Person.LoadFullStatus(categorisedPersonnel, bottomCategorised), followed by Status.LoadFullStatus(self).                         |
@@ -117,7 +134,7 @@ from ujson import load
 # |         6a.1. In DataManager.__psTop()    - top of pararde state is generated (just before rations)                                              |
 # |                                             with information from categorisedPersonnel dict and made into a string                               |
 # |         6a.2. In DataManager.__psMiddle() - middle of parade state is generated (rations portion)                                                |
-# |             6a.2.1. If dateRAW is not a key in data/override/rations.json, "everyday" will be used                                               |
+# |             6a.2.1. If dateRAW is not a key in StateStore.Rations(), "everyday" will be used                                                      |
 # |                     --> [0] - breakfast pax                                                                                                      |  
 # |                     --> [1] - lunch pax                                                                                                          |
 # |                     --> [2] - dinner pax                                                                                                         |
@@ -134,66 +151,84 @@ from ujson import load
 # |     6b. For /we, DataManager.CombinedBottomPS(startDateDT, endDateDT) is ran.                                                                    |
 # |         For /df, DataManager.CombinedDutyForecast(startDateDT, endDateDT) is ran.                                                                |
 # |         NOTE: fullPS will be set to FALSE                                                                                                        |
-# |         6b.1. DataManager.__LoadAll(date) is ran using startDateDT.                                                                              |
-# |               If /df, WCstandby is set to TRUE (to get G1 SB, G2 SB and G3A SB) and CommSec is obtained.                                         |
-# |         6b.2. For /we, data is parsed into a string, while for /df data is parsed into an excel sheet.                                           |
-# |         6b.3. startDateDT is incremented by one day and DataManager.__Update(date) is ran                                                        |
-# |               --> DataManager.__Update(date) clears bottomCategorised dict to original and                                                       |
-# |                   runs __SortStandbyAndDuty() to obtain next day bottomcategorised.                                                              |
-# |         6b.4. Data is parsed according to (6b.2).                                                                                                |
-# |         6b.5. Repeat steps (6b.2) to (6b.4) until startDateDT == endDateDT.                                                                      |
-# |         6b.6. Message/Excel sheet from startDateDT to endDateDT inclusive is generated.                                                          |
+# |         6b.1. DataManager.__LoadRange(startDateDT, endDateDT) builds the whole range in one pass (the range engine).                             |
+# |               If /df, WCstandby is set to TRUE (to get G1 SB, G2 SB and G3A SB), CommSec is obtained and the day after endDateDT is included.    |
+# |               6b.1.1. A personnel x days matrix of sheetStatus is made. Each month in the range takes a block of columns                         |
+# |                       straight from its own ME sheet (meSheet.Grid()), then override lists are placed over it.                                   |
+# |               6b.1.2. Every different sheetStatus in the matrix is resolved once (StatusTable) and                                               |
+# |                       turned into duty, standby and site VCOMM matrices (personnel x days) using numpy.                                          |
+# |               6b.1.3. Personnel are sorted by rankINT ONCE. For each day, personnel on duty/standby are taken in that order                      |
+# |                       and placed into their slots (DataManager.__FillSlots(), same rules as in (5)).                                             |
+# |               6b.1.4. Weapon controllers (adwIndex) and commSec (commSecRows of the month's layout) are taken for every day.                     |
+# |         6b.2. For each day, bottomCategorised is set from the result of (6b.1).                                                                  |
+# |               For /we, data is parsed into a string with __psBottom(), while for /df data is parsed into an excel sheet.                         |
+# |         6b.3. Message/Excel sheet from startDateDT to endDateDT inclusive is generated.                                                          |
+# |         6b.4. /we uses DataManager.StreamBottomPS(startDateDT, endDateDT) instead, which runs (6b.1) to (6b.3) for one day at a time              |
+# |               and yields each day. run.py joins the days (with daySeparator) into messages of at most 4096 characters                            |
+# |               and sends each one as soon as the next day does not fit, so the first days are sent without waiting for the rest.                  |
+# |                                                                                                                                                  |
+# | 7. Results of /f, /we and /df (workbook bytes, from ExcelProcesser) are kept in resultCache (KEY: command, startDate, endDate),                  |
+# |    together with the version from ResultVersion().                                                                                               |
+# |     --> version is made from DataStore.Version() of resultFiles, SheetStore.MEVersion() of every month in the range,                             |
+# |         StateStore.Version() of overrides and rations, SheetStore.ADWVersion() (adw.csv, adw_month.json and the adw in History,                  |
+# |         so an ADW sheet sent again for another month is not answered from an old result)                                                         |
+# |     --> DownloadDatabase, ObtainMergedCells, override/rations edits and personnel/status uploads all change these,                               |
+# |         so the result is only made again when the version is different                                                                           |
+# |     --> COS is the only part that depends on the chat, so it is added to the cached /f message for every request                                 |
+# |     --> GetResult/SetResult/ClearResults hold resultLock (they are called from the threads of Workers.Run), oldest results are removed first     |
 # |                                                                                                                                                  |
 # |==================================================================================================================================================|
 
-class Status:
-    def __init__ (self, rawSheetStatus, ref):
+class StatusTable:
+    def __init__(self, ref):
         self.definiteStatus = ref['definiteStatus']
-        self.indefiniteStatus = ref['indefiniteStatus']
-        self.moreDominantStatuses = ref['moreDominantStatuses']
+        self.moreDominantStatuses = set(ref['moreDominantStatuses'])
+        self.indefiniteStatus = [(category, re.compile('|'.join(keywords))) for category, keywords in ref['indefiniteStatus'].items()]
+
+        # rawSheetStatus -> sheetStatus
+        self.normalised = {}
+
+        # sheetStatus -> (displayStatus, category, standby, duty)
+        self.resolved = {}
+
+    def Normalise(self, rawSheetStatus):
+        sheetStatus = self.normalised.get(rawSheetStatus)
+
+        if sheetStatus is None:
+            sheetStatus = re.sub('\s*/\s*', '/', rawSheetStatus.upper().strip())
+            self.normalised[rawSheetStatus] = sheetStatus
         
-        self.sheetStatus = re.sub('\s*/\s*', '/', rawSheetStatus.upper().strip())
-        self.displayStatus = 'NIL'
-        self.category = 'UNKNOWN'
-        self.standby = False
-        self.duty = False
-    
-    def Reset(self, rawSheetStatus):
-        self.sheetStatus = re.sub('\s*/\s*', '/', rawSheetStatus.upper().strip())
-        self.standby = False
-        self.duty = False
+        return sheetStatus
 
-    def LoadStandbyAndDuty(self):
-        if re.search('.{2,}/.{2,}', self.sheetStatus):
-            splitSheetStatus = self.sheetStatus.split('/')
+    def Resolve(self, sheetStatus):
+        resolution = self.resolved.get(sheetStatus)
 
-            if 'SB' in splitSheetStatus:
-                self.standby = True
-        else:
-            if self.sheetStatus == 'X':
-                self.duty = True
-            if self.sheetStatus == 'SB':
-                self.standby = True
+        if resolution is None:
+            resolution = self.__Resolve(sheetStatus)
+            self.resolved[sheetStatus] = resolution
+        
+        return resolution
 
-    def LoadFullStatus(self):
-        dominantStatus = None
+    def __Resolve(self, sheetStatus):
+        standby = False
+        duty = False
 
         # if statment is for sheetStatuses with 2 different statuses (eg. COURSE/SB).
         # if statement does the following - examples below:
-        # 1. sheetStatus: SB/COURSE                  -> dominantStatus: COURSE                  (sets self.standby = True)
-        # 2. sheetStatus: SB/COURSE/MISSILE TRANSFER -> dominantStatus: COURSE/MISSILE TRANSFER (sets self.standby = True)
+        # 1. sheetStatus: SB/COURSE                  -> dominantStatus: COURSE                  (standby = True)
+        # 2. sheetStatus: SB/COURSE/MISSILE TRANSFER -> dominantStatus: COURSE/MISSILE TRANSFER (standby = True)
         # 3. sheetStatus: OFF/COURSE                 -> dominantStatus: OFF                     (NA)
         # 4. sheetStatus: OFF/CCL                    -> dominantStatus: OFF/CCL                 (NA)
         # [does not split U/S and O/S]
         # else statement does the following - examples below:
-        # 1. sheetStatus: SB                         -> dominantStatus: SB                      (sets self.standby = True)
-        # 2. sheetStatus: X                          -> dominantStatus: X                       (sets self.duty = True)
+        # 1. sheetStatus: SB                         -> dominantStatus: SB                      (standby = True)
+        # 2. sheetStatus: X                          -> dominantStatus: X                       (duty = True)
         # 3. sheetStatus: ANYTHING                   -> dominantStatus: ANYTHING                (NA)
-        if re.search('.{2,}/.{2,}', self.sheetStatus):
-            splitSheetStatus = self.sheetStatus.split('/')
+        if re.search('.{2,}/.{2,}', sheetStatus):
+            splitSheetStatus = sheetStatus.split('/')
 
             if 'SB' in splitSheetStatus:
-                self.standby = True
+                standby = True
                 splitSheetStatus.remove('SB')
             
             moreDominantStatus = [x for x in splitSheetStatus if x in self.moreDominantStatuses]
@@ -202,12 +237,12 @@ class Status:
             else:
                 dominantStatus = '/'.join(splitSheetStatus)
         else:
-            if self.sheetStatus == 'X':
-                self.duty = True
-            if self.sheetStatus == 'SB':
-                self.standby = True
+            if sheetStatus == 'X':
+                duty = True
+            if sheetStatus == 'SB':
+                standby = True
             
-            dominantStatus = self.sheetStatus
+            dominantStatus = sheetStatus
         
         # if   --- dominantStatus in definite_status.json - displayStatus and category are set
         # else --- searches indefinite_status.json
@@ -215,16 +250,114 @@ class Status:
         #    else --- NA                                 - displayStatus = dominantStatus (category remains as UNKNOWN)
         displayCategory = self.definiteStatus.get(dominantStatus)
         if displayCategory:
-            self.displayStatus = displayCategory['displayStatus']
-            self.category = displayCategory['category']
-        else:
-            for category in self.indefiniteStatus:
-                if re.search('|'.join(self.indefiniteStatus[category]), dominantStatus):
-                    self.displayStatus = dominantStatus
-                    self.category = category
-                    return
-            
-            self.displayStatus = dominantStatus
+            return displayCategory['displayStatus'], displayCategory['category'], standby, duty
+        
+        for category, pattern in self.indefiniteStatus:
+            if pattern.search(dominantStatus):
+                return dominantStatus, category, standby, duty
+        
+        return dominantStatus, 'UNKNOWN', standby, duty
+
+# status tables are only rebuilt when one of the files below is modified (or ClearStatusTable() is ran)
+statusTableFiles = {
+    'definiteStatus': 'data/reference/definite_status.json',
+    'indefiniteStatus': 'data/reference/indefinite_status.json',
+    'moreDominantStatuses': 'data/reference/more_dominant_status.json'
+}
+
+statusTableCache = {'version': None, 'table': None}
+
+def LoadStatusTable():
+    version = DataStore.Version(*statusTableFiles.values())
+
+    if statusTableCache['version'] != version:
+        ref = {name: DataStore.Load(path) for name, path in statusTableFiles.items()}
+
+        statusTableCache['table'] = StatusTable(ref)
+        statusTableCache['version'] = version
+    
+    return statusTableCache['table']
+
+def ClearStatusTable():
+    statusTableCache['version'] = None
+    statusTableCache['table'] = None
+
+# results of /f and /we are only made again when one of the files below (or the ME csv of a month in the date/range) is modified
+resultFiles = [
+    'data/personnel/alpha.json',
+    'data/personnel/bravo.json',
+    'data/personnel/others.json',
+    'data/reference/callsign_ref.json',
+    'data/reference/parade_state_categories.json',
+    *statusTableFiles.values(),
+    'data/override/merged_cells.json',
+    'data/database/adw/adw.csv'
+]
+
+# between the days of /we
+daySeparator = '\n\n---------------------------------------------------\n\n'
+
+# KEY: (command, startDate, endDate) | VALUE: (version, result), oldest first
+# results are got and set from the threads of Workers.Run, so resultCache is only used with resultLock held
+resultCache = OrderedDict()
+resultCacheSize = 64
+resultLock = threading.Lock()
+
+def ResultVersion(startDateDT, endDateDT):
+    version = DataStore.Version(*resultFiles) + StateStore.Version('overrides', 'rations') + SheetStore.ADWVersion()
+
+    monthDT = datetime.datetime(startDateDT.year, startDateDT.month, 1)
+    while monthDT <= endDateDT:
+        # months that are not in History or data/database/me are downloaded every time, so their results are not kept
+        try:
+            version += (SheetStore.MEVersion(monthDT),)
+        except FileNotFoundError:
+            return None
+
+        monthDT = (monthDT + datetime.timedelta(days=32)).replace(day=1)
+
+    return version
+
+def GetResult(key, version):
+    with resultLock:
+        cached = resultCache.get(key)
+
+    if version is not None and cached is not None and cached[0] == version:
+        return cached[1]
+
+    return None
+
+def SetResult(key, version, result):
+    if version is None:
+        return
+
+    with resultLock:
+        resultCache[key] = (version, result)
+        resultCache.move_to_end(key)
+
+        # oldest results are removed first
+        while len(resultCache) > resultCacheSize:
+            resultCache.popitem(last=False)
+
+def ClearResults():
+    with resultLock:
+        resultCache.clear()
+
+class Status:
+    def __init__ (self, rawSheetStatus, ref):
+        self.statusTable = ref['statusTable']
+        
+        self.sheetStatus = self.statusTable.Normalise(rawSheetStatus)
+        self.displayStatus = 'NIL'
+        self.category = 'UNKNOWN'
+        self.standby = False
+        self.duty = False
+    
+    def LoadStandbyAndDuty(self):
+        self.standby, self.duty = self.statusTable.Resolve(self.sheetStatus)[2:]
+
+    def LoadFullStatus(self):
+        self.displayStatus, self.category, self.standby, self.duty = self.statusTable.Resolve(self.sheetStatus)
 
 class Person:
     def __init__(self, flight, person, rawSheetStatus, ref):
@@ -274,43 +407,20 @@ class DataManager:
         self.dateRAW = None
         self.day = None
         self.WCrange = [0, 1, 2]
-        self.meDF = None
-        self.adwDF = None
+        self.meSheet = None
+        self.adwIndex = None
+        self.meSheets = {}
 
         self.personnel = []
         self.categorisedPersonnel = {}
         self.bottomCategorised = {'dutyPersonnel': [], 'standbyPersonnel': [], 'siteVcomm': 'UNKNOWN', 'weaponControllers': []}
 
         self.ref = {}
+        self.ref['psCategories'] = DataStore.Load('data/reference/parade_state_categories.json')
+        self.ref['rations'] = StateStore.Rations()
+        self.ref['username'] = StateStore.Users()
+        self.ref['statusTable'] = LoadStatusTable()
 
-        fileName = [
-            'callsign',
-            'definiteStatus',
-            'indefiniteStatus',
-            'moreDominantStatuses',
-            'psCategories',
-            'mergedCells',
-            'psOverride',
-            'rations',
-            'username'
-        ]
-
-        filePath = [
-            'data/reference/callsign_ref.json',
-            'data/reference/definite_status.json',
-            'data/reference/indefinite_status.json',
-            'data/reference/more_dominant_status.json',
-            'data/reference/parade_state_categories.json',
-            'data/override/merged_cells.json',
-            'data/override/parade_state_override.json',
-            'data/override/rations.json',
-            'data/reference/username_ref.json'
-        ]
-
-        for name, path in zip(fileName, filePath):
-            with open(path) as file:
-                self.ref[name] = load(file)
-        
         for category in self.ref['psCategories']:
             self.categorisedPersonnel[category] = []
         
@@ -330,72 +440,50 @@ class DataManager:
             return ValueError
 
         self.day = int(self.dateDT.strftime('%#d'))
-        self.meDF = Functions.OpenSheet(self.dateDT, 'me')
-        self.adwDF = Functions.OpenSheet(self.dateDT, 'adw')
+
+        # sheets that are not in data/database/me are downloaded, so keep them for the other dates
+        monthKey = (self.dateDT.month, self.dateDT.year)
+        with Metrics.Stage('sheet load'):
+            if monthKey not in self.meSheets:
+                self.meSheets[monthKey] = SheetStore.OpenME(self.dateDT)
+
+            self.meSheet = self.meSheets[monthKey]
+            self.layout = SheetStore.Layout(monthKey, self.meSheet)
+            self.adwIndex = SheetStore.OpenADWIndex()
 
     def __LoadME(self, nameStatus):
-        for x in range(Global.TOP, Global.MIDDLE):
-            if self.meDF.iloc[x, 0] != 'NIL':
-                nameStatus[self.meDF.iloc[x, 0].upper().strip()] = self.meDF.iloc[x, self.day]
+        for sheetName, x in self.layout.sheetRows.items():
+            nameStatus[sheetName] = self.meSheet.rows[x][self.day]
     
     def __GetCommSec(self):
         csToDisplay = Functions.ObtainMap('commSec', 'displayNoStatus')
 
-        for x in range(Global.MIDDLE, Global.BOTTOM):
-            if self.meDF.iloc[x, self.day].upper().strip() == 'C':
-                self.bottomCategorised['commSec'] = csToDisplay.get(self.meDF.iloc[x, 0].upper().strip(), 'UNKNOWN')
+        for commSec, x in self.layout.commSecRows.items():
+            if self.meSheet.rows[x][self.day].upper().strip() == 'C':
+                self.bottomCategorised['commSec'] = csToDisplay.get(commSec, 'UNKNOWN')
                 return
         
         self.bottomCategorised['commSec'] = 'UNKNOWN'
 
     def __GetWeaponControllers(self):
         for x in self.WCrange:
-            self.bottomCategorised['weaponControllers'].append(self.adwDF.iloc[x, self.day + 1].upper().strip())
-    
-    def __SplitCallsigns(self, deltaDay: int):
-        temp = []
-
-        # places those on duty(A2(D) to G4) the previous day/on the day into a list
-        # splitting ones with multiple callsigns into seperate items
-        for x in [self.adwDF.iloc[x, self.day + deltaDay].upper().strip() for x in range(3)]:
-            if '/' in x:
-                temp.extend(x.split('/'))
-            else:
-                temp.append(x)
-        
-        return temp
+            self.bottomCategorised['weaponControllers'].append(self.adwIndex.Slots(self.dateDT)[x])
 
     def __LoadADW(self, nameStatus):
         self.__GetWeaponControllers()
 
-        # places those on duty the day before into a list and splits those with '/'
-        adw_daybefore_list = self.__SplitCallsigns(0)
-
         # putting all those on duty the day before on changeover
-        for x in adw_daybefore_list:
-            for callsign in self.ref['callsign']:
-                if callsign in x:
-                    nameStatus[self.ref['callsign'][callsign]] = '\\'
-                    break
-
-        # places those on duty into a list and splits those with '/'
-        adw_day_list = self.__SplitCallsigns(1)
+        for sheetName, status in self.adwIndex.DutyStatuses(self.dateDT, True):
+            nameStatus[sheetName] = '\\'
 
         # if (R) present, status is R
         # else status is HFD
-        for x in adw_day_list:
-            for callsign in self.ref['callsign']:
-                if callsign in x:
-                    if "(R)" in x:
-                        nameStatus[self.ref['callsign'][callsign]]  = "R"
-                    else:
-                        nameStatus[self.ref['callsign'][callsign]]  = "HFD"
-                    break
+        for sheetName, status in self.adwIndex.DutyStatuses(self.dateDT):
+            nameStatus[sheetName] = status
     
     def __LoadOverrideLists(self, nameStatus):
-        for x in self.ref['mergedCells'] + self.ref['psOverride']:
-            if Functions.DateConverter(x['startDate']) <= self.dateDT <= Functions.DateConverter(x['endDate']):
-                nameStatus[x['sheetName']] = x['sheetStatus']
+        for x in OverrideIndex.Open().Covering(self.dateDT):
+            nameStatus[x['sheetName']] = x['sheetStatus']
 
     def __LoadSheetStatus(self, date):
         self.__SetDate(date)
@@ -410,51 +498,30 @@ class DataManager:
 
         return nameStatus
     
+    def __FillSlots(self, personnelList, slotType):
+        # [lowest rankINT, highest rankINT (not inclusive), nor (None if both NSF and REGULAR)] of each slot
+        slotRef = {
+            'duty': [[9, 12, None], [4, 9, 'REGULAR'], [1, 9, 'REGULAR'], [1, 9, 'REGULAR'], [1, 3, 'NSF'], [1, 3, 'NSF']],
+            'standby': [[9, 12, None], [1, 9, 'REGULAR'], [1, 3, 'NSF']]
+        }[slotType]
+
+        personnelNew = ['UNKNOWN' for x in range(len(slotRef))]
+        openSlots = [x for x in range(len(slotRef))]
+        for personnel in personnelList:
+            for i in openSlots:
+                if personnel.rankINT in range(slotRef[i][0], slotRef[i][1]) and slotRef[i][2] in [None, personnel.nor]:
+                    openSlots.remove(i)
+                    personnelNew[i] = personnel.displayNoStatus
+                    break
+        
+        return personnelNew
+
     def __SortStandbyAndDuty(self):
         self.bottomCategorised['dutyPersonnel'] = sorted(self.bottomCategorised['dutyPersonnel'], key=lambda x: x.rankINT, reverse=True)
         self.bottomCategorised['standbyPersonnel'] = sorted(self.bottomCategorised['standbyPersonnel'], key=lambda x: x.rankINT, reverse=True)
 
-        rankRef = {"duty": [[9, 12], [4, 9], [1, 9], [1, 9], [1, 3], [1, 3]], "standby": [[9, 12], [1, 9], [1, 3]]}
-
-        dutyPersonnelNew = ['UNKNOWN' for x in range(6)]
-        dutyOpenSlots = [x for x in range(6)]
-        for personnel in self.bottomCategorised['dutyPersonnel']:
-            add = False
-            for i in dutyOpenSlots:
-                if personnel.rankINT in range(rankRef['duty'][i][0], rankRef['duty'][i][1]):
-                    if i == 0:
-                        add = True
-                    if i in [1, 2, 3] and personnel.nor == 'REGULAR':
-                        add = True
-                    if i in [4, 5] and personnel.nor == 'NSF':
-                        add = True
-
-                    if add:
-                        dutyOpenSlots.remove(i)
-                        dutyPersonnelNew[i] = personnel.displayNoStatus
-                        break
-        
-        self.bottomCategorised['dutyPersonnel'] = dutyPersonnelNew
-
-        standbyPersonnelNew = ['UNKNOWN' for x in range(3)]
-        standbyOpenSlots = [x for x in range(3)]
-        for personnel in self.bottomCategorised['standbyPersonnel']:
-            add = False
-            for i in standbyOpenSlots:
-                if personnel.rankINT in range(rankRef['standby'][i][0], rankRef['standby'][i][1]):
-                    if i == 0:
-                        add = True
-                    if i == 1 and personnel.nor == 'REGULAR':
-                        add = True
-                    if i == 2 and personnel.nor == 'NSF':
-                        add = True
-
-                    if add:
-                        standbyOpenSlots.remove(i)
-                        standbyPersonnelNew[i] = personnel.displayNoStatus
-                        break
-        
-        self.bottomCategorised['standbyPersonnel'] = standbyPersonnelNew
+        self.bottomCategorised['dutyPersonnel'] = self.__FillSlots(self.bottomCategorised['dutyPersonnel'], 'duty')
+        self.bottomCategorised['standbyPersonnel'] = self.__FillSlots(self.bottomCategorised['standbyPersonnel'], 'standby')
 
     def __LoadAll(self, date, WCstandby=False):
         if WCstandby:
@@ -462,14 +529,11 @@ class DataManager:
         nameStatus = self.__LoadSheetStatus(date)
 
         for flight in ['alpha', 'bravo', 'others']:
-            with open(f'data/personnel/{flight}.json') as flightJson:
-                flightList = load(flightJson)
-        
-            for person in flightList:
+            for person in DataStore.Load(f'data/personnel/{flight}.json'):
                 self.personnel.append(Person(flight, person, nameStatus.get(person['sheetName'], 'UNKNOWN'), self.ref))
 
                 if self.fullPS:
-                    if person['sheetName'] in self.ref['callsign'].values() and not person['sheetName'] in nameStatus:
+                    if person['sheetName'] in self.adwIndex.callsignSheetNames and not person['sheetName'] in nameStatus:
                         self.personnel[-1].status.sheetStatus = 'NIL'
                     
                     self.personnel[-1].LoadFullStatus(self.categorisedPersonnel, self.bottomCategorised)
@@ -479,21 +543,121 @@ class DataManager:
 
         self.__SortStandbyAndDuty()
     
-    def __Update(self, date):
-        self.bottomCategorised = {'dutyPersonnel': [], 'standbyPersonnel': [], 'siteVcomm': 'UNKNOWN', 'weaponControllers': []}
+    def __LoadRange(self, startDateDT, endDateDT, WCstandby=False, commSec=False):
+        if WCstandby:
+            self.WCrange = [0, 1, 2, 4, 5, 6]
 
-        nameStatus = self.__LoadSheetStatus(date)
+        statusTable = self.ref['statusTable']
+        dates = [startDateDT + datetime.timedelta(days=x) for x in range((endDateDT - startDateDT).days + 1)]
 
-        for person in self.personnel:
-            person.status.Reset(nameStatus.get(person.sheetName, 'UNKNOWN'))
-            person.LoadStandbyAndDuty(self.bottomCategorised)
-        
-        self.__SortStandbyAndDuty()
+        self.personnel = []
+        for flight in ['alpha', 'bravo', 'others']:
+            for person in DataStore.Load(f'data/personnel/{flight}.json'):
+                self.personnel.append(Person(flight, person, 'UNKNOWN', self.ref))
+
+        sheetNames = np.array([person.sheetName for person in self.personnel], dtype=object)
+
+        # 1. personnel x days matrix of sheetStatus
+        #    --> rows: self.personnel | columns: dates
+        #    --> each month in the range is taken from its own ME sheet
+        statusMatrix = np.full((len(self.personnel), len(dates)), 'UNKNOWN', dtype=object)
+        weaponControllers = []
+        commSecs = []
+
+        monthColumns = {}
+        for column, date in enumerate(dates):
+            monthColumns.setdefault((date.month, date.year), []).append(column)
+
+        # all months in the range are read from History at once
+        with Metrics.Stage('sheet load'):
+            for monthKey, meSheet in SheetStore.OpenMEs(list(monthColumns)).items():
+                self.meSheets.setdefault(monthKey, meSheet)
+
+        for columns in monthColumns.values():
+            self.__SetDate(dates[columns[0]])
+            grid = self.meSheet.Grid()
+            days = [dates[x].day for x in columns]
+
+            rowIndex = self.layout.sheetRows
+            personnelRows = np.array([rowIndex.get(x, -1) for x in sheetNames], dtype=int)
+            inSheet = personnelRows >= 0
+            statusMatrix[np.ix_(inSheet, columns)] = grid[np.ix_(personnelRows[inSheet], days)]
+
+            for x in columns:
+                weaponControllers.append([self.adwIndex.Slots(dates[x])[y] for y in self.WCrange])
+
+            if commSec:
+                csToDisplay = Functions.ObtainMap('commSec', 'displayNoStatus')
+                commSecNames = list(self.layout.commSecRows)
+                commSecRows = list(self.layout.commSecRows.values())
+
+                if not commSecRows:
+                    commSecs.extend(['UNKNOWN'] * len(days))
+                    continue
+
+                isC = np.frompyfunc(lambda x: isinstance(x, str) and x.upper().strip() == 'C', 1, 1)(grid[np.ix_(commSecRows, days)]).astype(bool).reshape(-1, len(days))
+                firstRow = isC.argmax(axis=0)
+
+                for x in range(len(days)):
+                    if isC[firstRow[x], x]:
+                        commSecs.append(csToDisplay.get(commSecNames[firstRow[x]], 'UNKNOWN'))
+                    else:
+                        commSecs.append('UNKNOWN')
+
+        # override lists are placed over the ME sheet (in the same order as __LoadOverrideLists)
+        firstOrdinal = dates[0].toordinal()
+        for startOrdinal, endOrdinal, x in OverrideIndex.Open().Overlapping(dates[0], dates[-1]):
+            startColumn = max(startOrdinal - firstOrdinal, 0)
+            endColumn = min(endOrdinal - firstOrdinal, len(dates) - 1)
+
+            statusMatrix[sheetNames == x['sheetName'], startColumn:endColumn + 1] = x['sheetStatus']
+
+        # 2. every different sheetStatus is resolved once and the results are spread over the matrix
+        vocabulary = {}
+        statusCodes = np.array(
+            [vocabulary.setdefault(statusTable.Normalise(x), len(vocabulary)) for x in statusMatrix.flat],
+            dtype=int
+        ).reshape(statusMatrix.shape)
+
+        resolved = [statusTable.Resolve(x) for x in vocabulary]
+        standby = np.array([x[2] for x in resolved], dtype=bool)[statusCodes]
+        duty = np.array([x[3] for x in resolved], dtype=bool)[statusCodes]
+        siteVcomm = np.array([x == 'SITE VCOMM' for x in vocabulary], dtype=bool)[statusCodes]
+
+        # 3. personnel sorted once by rank (same order as sorted() in __SortStandbyAndDuty)
+        rankOrder = np.array(sorted(range(len(self.personnel)), key=lambda x: self.personnel[x].rankINT, reverse=True), dtype=int)
+        dutyRanked = duty[rankOrder]
+        standbyRanked = standby[rankOrder]
+
+        result = []
+        for column, date in enumerate(dates):
+            siteVcommRows = np.flatnonzero(siteVcomm[:, column])
+
+            bottomCategorised = {
+                'dutyPersonnel': self.__FillSlots([self.personnel[x] for x in rankOrder[dutyRanked[:, column]]], 'duty'),
+                'standbyPersonnel': self.__FillSlots([self.personnel[x] for x in rankOrder[standbyRanked[:, column]]], 'standby'),
+                'siteVcomm': self.personnel[siteVcommRows[-1]].displayNoStatus if siteVcommRows.size else 'UNKNOWN',
+                'weaponControllers': weaponControllers[column]
+            }
+
+            if commSec:
+                bottomCategorised['commSec'] = commSecs[column]
+
+            result.append((date, bottomCategorised))
+
+        return result
     
+    def __SetRangeDate(self, dateDT, bottomCategorised):
+        self.dateDT = dateDT
+        self.dateRAW = Functions.DateConverter(dateDT)
+        self.day = dateDT.day
+        self.bottomCategorised = bottomCategorised
+
+    def __psHeader(self):
+        return f'Good Day ALPHA, below is the Forecasted Parade State for {self.dateRAW}.\n\n'
+
     def __psTop(self):
-        psStr = f'Good Day ALPHA, below is the Forecasted Parade State for {self.dateRAW}.\n\n' \
-                f'COS: {self.cos}\n\n' \
-                f'TOTAL STRENGTH ({len([x for x in self.personnel if x.flight == "alpha"])})\n\n'
+        psStr = f'TOTAL STRENGTH ({len([x for x in self.personnel if x.flight == "alpha"])})\n\n'
         
         for category in self.categorisedPersonnel:
             if category != 'UNKNOWN':
@@ -551,32 +715,69 @@ class DataManager:
     
     def FullPS(self, date):
         self.fullPS = True
-        self.__LoadAll(date)
-        return self.__psTop() + self.__psMiddle() + self.__psBottom()
+
+        dateDT = date if isinstance(date, datetime.datetime) else Functions.DateConverter(date)
+        key = ('f', dateDT, dateDT)
+        version = ResultVersion(dateDT, dateDT)
+        result = GetResult(key, version)
+
+        if result is None:
+            with Metrics.Stage('status resolution'):
+                self.__LoadAll(date)
+
+            with Metrics.Stage('rendering'):
+                result = {
+                    'state': {x: getattr(self, x) for x in ['dateDT', 'dateRAW', 'day', 'meSheet', 'adwIndex', 'personnel', 'categorisedPersonnel', 'bottomCategorised']},
+                    'header': self.__psHeader(),
+                    'body': self.__psTop() + self.__psMiddle() + self.__psBottom()
+                }
+            SetResult(key, version, result)
+        else:
+            # categorisedPersonnel (eg. UNKNOWN) is still available after FullPS()
+            self.__dict__.update(result['state'])
+
+        # COS is different for every chat, so it is the only part not kept
+        return result['header'] + f'COS: {self.cos}\n\n' + result['body']
     
     def CombinedBottomPS(self, startDateDT, endDateDT):
         self.fullPS = False
-        self.__LoadAll(startDateDT)
-        combStr = self.__psBottom()
 
-        while startDateDT < endDateDT:
-            startDateDT += datetime.timedelta(days=1)
-            self.__Update(startDateDT)
-            combStr += '\n\n---------------------------------------------------\n\n' + self.__psBottom()
+        key = ('we', startDateDT, endDateDT)
+        version = ResultVersion(startDateDT, endDateDT)
+        result = GetResult(key, version)
+
+        if result is None:
+            psBottoms = []
+
+            with Metrics.Stage('status resolution'):
+                days = self.__LoadRange(startDateDT, endDateDT)
+
+            with Metrics.Stage('rendering'):
+                for dateDT, bottomCategorised in days:
+                    self.__SetRangeDate(dateDT, bottomCategorised)
+                    psBottoms.append(self.__psBottom())
+            
+                result = daySeparator.join(psBottoms)
+            SetResult(key, version, result)
         
-        return combStr
+        return result
     
+    # same days as CombinedBottomPS, but each day is yielded as soon as it is made (each day is kept in resultCache on its own)
+    def StreamBottomPS(self, startDateDT, endDateDT):
+        for x in range((endDateDT - startDateDT).days + 1):
+            dateDT = startDateDT + datetime.timedelta(days=x)
+            yield self.CombinedBottomPS(dateDT, dateDT)
+
     def CombinedDutyForecast(self, startDateDT, endDateDT):
         self.fullPS = False
         beforeDateRAW = Functions.DateConverter(startDateDT - datetime.timedelta(days=1))
-        
-        self.__LoadAll(startDateDT, True)
-        self.__GetCommSec()
-        yield self.dateRAW, beforeDateRAW, self.bottomCategorised
-
-        while startDateDT <= endDateDT:
-            beforeDateRAW = Functions.DateConverter(startDateDT)
-            startDateDT += datetime.timedelta(days=1)
-            self.__Update(startDateDT)
-            self.__GetCommSec()
-            yield self.dateRAW, beforeDateRAW, self.bottomCategorised
\ No newline at end of file
+
+        # also includes the day after endDateDT (for RVAAC of endDateDT)
+        # (nothing is yielded inside the stage, see Metrics.Stage)
+        with Metrics.Stage('status resolution'):
+            days = self.__LoadRange(startDateDT, endDateDT + datetime.timedelta(days=1), True, True)
+
+        for dateDT, bottomCategorised in days:
+            self.__SetRangeDate(dateDT, bottomCategorised)
+            yield self.dateRAW, beforeDateRAW, self.bottomCategorised
+            beforeDateRAW = self.dateRAW
@@ -0,0 +1,145 @@
+import io
+import os
+import time
+import glob
+import pstats
+import random
+import marshal
+import cProfile
+import datetime
+import threading
+import contextvars
+
+# |=============================================================================================================================|
+# |                                                                                                                             |
+# |                           WHERE THE TIME OF ONE COMMAND GOES (cProfile, /profile in run.py)                                 |
+# |                                                                                                                             |
+# | --> /profile df 010224 200224 runs /df 010224 200224 under cProfile, and replies with the functions that took the longest   |
+# |     (cumulative time) and the full .pstats file (open with python -m pstats or snakeviz)                                    |
+# | --> Only work ran in Workers.Run() is profiled (that is where commands are slow), every call of Run() is profiled in its    |
+# |     own worker thread and the results are added together                                                                    |
+# | --> The command being profiled is kept in a contextvar, so commands of other chats running at the same time are not         |
+# |     profiled (each update is handled in its own task, with its own context)                                                 |
+# | --> Slow commands can be sampled without /profile: a fraction of all commands/jobs is profiled, and the ones slower than    |
+# |     PROFILE_SLOW_SECONDS are saved in data/profiles (/profile slow sends the latest one)                                    |
+# |                                                                                                                             |
+# | Settings (from .env, optional):                                                                                             |
+# | --> PROFILE_SAMPLE_RATE  - fraction of commands/jobs profiled (default 0, eg. 0.05 for 1 in 20)                             |
+# | --> PROFILE_SLOW_SECONDS - sampled commands/jobs that take at least this long are saved (default 5)                         |
+# | --> PROFILE_KEEP         - number of files kept in data/profiles (default 20, oldest are removed)                           |
+# | --> PROFILE_TOP          - number of functions in the reply (default 25)                                                    |
+# |                                                                                                                             |
+# | FUNCTIONS:                                                                                                                  |
+# | 1. Active()              - Capture of the current command (None if it is not profiled), used in Workers.Run()               |
+# | 2. Sample(name)          - with Sample(name): ... profiles a fraction of calls and saves the slow ones (in Metrics.Handler) |
+# | 3. Top(stats)            - text of the top PROFILE_TOP functions of pstats.Stats stats                                      |
+# | 4. Dump(stats)           - stats as the bytes of a .pstats file                                                             |
+# | 5. LatestSlow()          - (file name, bytes) of the latest file in data/profiles (None if there is none)                   |
+# |                                                                                                                             |
+# | CLASS Capture:                                                                                                              |
+# | --> with Capture() as capture: ... every Workers.Run() inside is profiled                                                   |
+# | --> RunCall(call) - runs call under its own cProfile.Profile (in the worker thread)                                         |
+# | --> Stats()       - pstats.Stats of every call added together (None if nothing was profiled)                                |
+# |                                                                                                                             |
+# |=============================================================================================================================|
+
+profilesFolder = 'data/profiles'
+active = contextvars.ContextVar('profile', default=None)
+
+class Capture:
+    def __init__(self):
+        self.profiles = []
+        self.lock = threading.Lock()
+        self.token = None
+
+    def __enter__(self):
+        self.token = active.set(self)
+        return self
+
+    def __exit__(self, errorType, error, traceback):
+        active.reset(self.token)
+
+    def RunCall(self, call):
+        profile = cProfile.Profile()
+
+        try:
+            return profile.runcall(call)
+        finally:
+            with self.lock:
+                self.profiles.append(profile)
+
+    def Stats(self):
+        with self.lock:
+            profiles = list(self.profiles)
+
+        if not profiles:
+            return None
+
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+
+        return stats
+
+def Active():
+    return active.get()
+
+def Top(stats):
+    stream = io.StringIO()
+
+    # file paths are shortened on a copy, the .pstats file keeps the full paths
+    shown = pstats.Stats(stream=stream)
+    shown.add(stats)
+    shown.strip_dirs().sort_stats('cumulative').print_stats(int(os.getenv('PROFILE_TOP', 25)))
+
+    # first lines are the (empty) file names of the profiles
+    return stream.getvalue().strip('\n').split('\n\n', 1)[-1].strip('\n')
+
+def Dump(stats):
+    # same as stats.dump_stats(path), without the file
+    return marshal.dumps(stats.stats)
+
+def LatestSlow():
+    paths = glob.glob(os.path.join(profilesFolder, '*.pstats'))
+    if not paths:
+        return None
+
+    path = max(paths, key=os.path.getmtime)
+    with open(path, 'rb') as file:
+        return os.path.basename(path), file.read()
+
+class Sample:
+    def __init__(self, name):
+        self.name = name
+        self.capture = None
+
+    def __enter__(self):
+        # commands already profiled (eg. jobs ran inside /update, or /profile) are not sampled again
+        rate = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+
+        if rate > 0 and active.get() is None and random.random() < rate:
+            self.capture = Capture().__enter__()
+            self.start = time.perf_counter()
+
+        return self
+
+    def __exit__(self, errorType, error, traceback):
+        if self.capture is None:
+            return
+
+        self.capture.__exit__(errorType, error, traceback)
+
+        if time.perf_counter() - self.start >= float(os.getenv('PROFILE_SLOW_SECONDS', 5)):
+            stats = self.capture.Stats()
+            if stats is not None:
+                self.__Save(stats)
+
+    def __Save(self, stats):
+        os.makedirs(profilesFolder, exist_ok=True)
+        path = os.path.join(profilesFolder, f'{self.name}_{datetime.datetime.now().strftime("%y%m%d_%H%M%S_%f")}.pstats')
+
+        with open(path, 'wb') as file:
+            file.write(Dump(stats))
+
+        for oldPath in sorted(glob.glob(os.path.join(profilesFolder, '*.pstats')), key=os.path.getmtime)[:-int(os.getenv('PROFILE_KEEP', 20))]:
+            os.remove(oldPath)
@@ -1,11 +1,17 @@
-import Global
 import re
 import os
 import calendar
 import datetime
+import io
+import Workers
+import Fetcher
+import History
+import DataStore
+import StateStore
 import Functions
-import pandas as pd
-from ujson import load, dump
+import Metrics
+import SheetStore
+import numpy as np
 from calendar import monthrange
 
 # |==================================================================================================================================================================|
@@ -13,38 +19,48 @@ from calendar import monthrange
 # |                                                     ALL FUNCTIONS THAT ARE SCHEDULED (also in /update)                                                           |
 # |                                                                                                                                                                  |
 # | Functions sent to bot.job_queue._ (context is not used but added so that it can be inputted into bot.job_queue._):                                               |
+# | --> The functions below are blocking, so they are ran in Workers.Run() (the bot still answers commands while they run)                                           |
 # | --> EveryThirtyMinutes(context, scheduled) - runs every THIRTY MINUTES (can be changed as an argument in run.py -> bot.job_queue.run_repeating)                  |
 # |     --> If run through bot.job_queue._, if statement ensures that DownloadDatabase() and ObtainMergedCells() runs from 10am - 10pm SGT.                          |
 # |         (added above so that google cloud engine does not charge me ! (runs too many times so had to limit it))                                                  |
 # |         If run through /update, scheduled will be FALSE, and functions can be ran.                                                                               |
 # |     --> DownloadDataBase()  - downloads ME_df for the month before, current month and month after (if available) and stores it as a csv in data/database/me      |
+# |                               (sheets that are the same as the csv already saved are not saved again, returns months that changed)                               |
 # |     --> ObtainMergedCells() - obtain the merged cells in the google sheet as pandas' to_csv does not recognise merged cells                                      |
 # |                               (how it works is explained below) (works most of the time lol)                                                                     |
+# |                               --> FindMergedCells() compares both sheets as whole arrays, each run of different cells in a row is one merged block               |
+# |     --> All 3 months and the sheet with merged cells are downloaded at the same time through Fetcher.py (shared connections, retries)                            |
 # |                                                                                                                                                                  |
 # | --> EveryDaily(context) - runs once every DAY                                                                                                                    |
-# |     --> RemoveOutdated() - removes all the outdated dates in data/override/(parade_state_override/rations).json                                                  |
+# |     --> RemoveOutdated() - removes all the outdated overrides and rations from StateStore.py (data/state.db)                                                     |
 # |                            (dates older than the current date are removed)                                                                                       |
+# |                            (only the expired rows are deleted, expired overrides are skipped by OverrideIndex anyway)                                            |
+# |                                                                                                                                                                  |
+# | --> StartupRefresh(context) - runs once when run.py is started (bot.job_queue.run_once), the bot answers commands straight away                                  |
+# |     from the last data saved on disk while this runs                                                                                                             |
+# |     --> RemoveOutdated(), DownloadDatabase() and ObtainMergedCells(), but only the ones that are Due()                                                           |
+# |     --> Due(name) - whether a refresh has to be ran again, from the time it last ran (StateStore.LastRuns(), saved by Ran(name))                                 |
+# |         --> DownloadDatabase and ObtainMergedCells stay fresh for refreshIntervals (30 minutes, the same as EveryThirtyMinutes)                                  |
+# |         --> RemoveOutdated stays fresh until the end of the day it ran                                                                                           |
+# |         --> DownloadDatabase is only saved as ran if every month was downloaded (so it is ran again after a failed download)                                     |
+# |     --> If google cannot be reached, the bot keeps using the csv files already in data/database/me                                                               |
 # |                                                                                                                                                                  |
 # | --> EveryMonth(context) - runs once on the LAST DAY of each MONTH                                                                                                |
-# |     --> dateDT - will be the next month if it is on the last day (scheduled).                                                                                    |
-# |                - will be current month if not ran on the last day (/update).                                                                                     |
-# |     --> GetGlobalVariables(dateDT) - get variables in Global.py (if last dat of month, would want to get next month's TOP, MIDDLE and BOTTOM)                    |
 # |     --> GetmeMonthRef()            - obtain month in name of ME_df google sheet (eg. Jan 24 -> JAN will be saved), so that the coreect sheet can be accessed     |
-# |         1. Loads in list from data/reference/meDF_month_ref.json with already saved dates                                                                        |
+# |         1. Loads in data/reference/sheet_name_ref.json (DICT KEY: month/year, eg. 1/2024 | VALUE: sheet name found before, eg. JAN)                              |
+# |            --> months already in it are never tried again                                                                                                        |
 # |         2. Makes a list with months in full - ["JANUARY", "FEBRUARY", "MARCH", ...]                                                                              |
-# |         3. Starts with the month before, and loads in file with sheet name as the first three letters of month name (eg. JAN),                                   |
-# |            by sending a request to google sheet website (to obtain csv of sheet)                                                                                 |
-# |         4. __MonthChecker(meDF, ...) checks whether the sheet loaded in is the correct date (eg. checks for Jan in 1-Jan at ~ 10th row)                          |
-# |         5a. If it is not the correct month (eg. when checking for Jan, 1-Feb present), a letter is added and a request is sent again (eg. JAN -> JANU).          |
-# |             5a.1. Step (4) is repeated                                                                                                                           |
-# |             5a.2. Steps (5a) to (5a.1) is repeated until it detects the correct month - to (5b), or until the whole month is spelled out                         |
-# |             5a.3. If the whole month is spelled out, list in (1) is not rewritten (indicated failure or sheet not present).                                      |
-# |         5b. If it is the correct month, the current month is saved into list in (1)                                                                              |
-# |             (eg. If passes on JAN, JAN is saved. If passes on JANU, saves JANU).                                                                                 |
-# |         6. Repeats (3) to (5) for the current month and the month after                                                                                          |
+# |         3. For the month before, current month and month after that are not in (1), every name from the first three letters to the                               |
+# |            whole month (eg. JAN, JANU, JANUA, ..., JANUARY) is requested from google sheets at the same time (Fetcher.Submit)                                    |
+# |         4. __MonthChecker(meDF, name) checks whether the sheet loaded in is the correct date (eg. checks for Jan in 1-Jan at ~ 10th row)                         |
+# |         5. The shortest name that passes is saved into (1) and data/reference/meDF_month_ref.json, the longer names of that month are cancelled                  |
+# |            --> results are checked shortest name first (not in the order they finish), google returns the default sheet for names that                           |
+# |                do not exist, so longer names (eg. JANUARY) also pass for the default month                                                                       |
+# |            (if no name passes, nothing is saved for that month (sheet not present), so it is tried again next time)                                              |
 # |                                                                                                                                                                  |
 # |==================================================================================================================================================================| 
 
+@Metrics.Job
 async def EveryThirtyMinutes(context, scheduled=True):
     run = False
     if scheduled:
@@ -54,53 +70,155 @@ async def EveryThirtyMinutes(context, scheduled=True):
         run = True
     
     if run:
-        DownloadDatabase()
-        ObtainMergedCells()
+        # sheet with merged cells is downloaded at the same time as the ME sheets
+        mergedPage = Fetcher.Submit(mergedCellsURL) if MergedCellsDue() else None
+
+        changedMonths = await Workers.Run(DownloadDatabase)
+        await Workers.Run(ObtainMergedCells, mergedPage)
+
+        return changedMonths
+    
+    return []
+
+# KEY: name of a refresh | VALUE: how long it is fresh for after it ran (None - until the end of the day)
+refreshIntervals = {
+    'DownloadDatabase': datetime.timedelta(minutes=30),
+    'ObtainMergedCells': datetime.timedelta(minutes=30),
+    'RemoveOutdated': None
+}
+
+def Due(name):
+    lastRun = StateStore.LastRuns().get(name)
+
+    if lastRun is None:
+        return True
+
+    lastRunDT = datetime.datetime.fromisoformat(lastRun)
+    nowDT = Functions.CurrentDatetime().replace(tzinfo=None)
+
+    if refreshIntervals[name] is None:
+        return lastRunDT.date() != nowDT.date()
+
+    return nowDT - lastRunDT >= refreshIntervals[name]
 
+def Ran(name):
+    StateStore.SetLastRun(name, Functions.CurrentDatetime().replace(tzinfo=None).isoformat(timespec='seconds'))
+
+@Metrics.Job
+async def StartupRefresh(context):
+    # local work first, so a failed download does not stop it
+    if Due('RemoveOutdated'):
+        await Workers.Run(RemoveOutdated)
+
+    mergedPage = Fetcher.Submit(mergedCellsURL) if Due('ObtainMergedCells') and MergedCellsDue() else None
+
+    if Due('DownloadDatabase'):
+        await Workers.Run(DownloadDatabase)
+
+    if Due('ObtainMergedCells'):
+        await Workers.Run(ObtainMergedCells, mergedPage)
+
+@Metrics.Job
 async def EveryDaily(context):
-    RemoveOutdated()
+    await Workers.Run(RemoveOutdated)
 
+@Metrics.Job
 async def EveryMonth(context):
-    dateDT = Functions.CurrentDatetime() + datetime.timedelta(days=1)
-    
-    GetGlobalVariables(dateDT)
-    GetmeDFMonthRef()
+    await Workers.Run(GetmeDFMonthRef)
 
 # downloads ME and ADW sheets for previous, current and next month
-# saves sheets as csv file
+# saves sheets as csv file (only if the sheet has changed)
+# returns (month, year) of the sheets that changed
 def DownloadDatabase():
-    for file in os.scandir('data/database/me'):
-        os.remove(file)
-
     currentMonth = int(Functions.CurrentDatetime().strftime('%#m'))
     currentYear = int(Functions.CurrentDatetime().strftime('%y'))
 
-    for deltaMonths in range(-1, 2):
-        itMonth, itYear = Functions.timedelta_months(currentMonth, currentYear, deltaMonths)
-        
-        meDF = Functions.csv_to_dataframe(itMonth, itYear, 'me')
+    months = [Functions.timedelta_months(currentMonth, currentYear, deltaMonths) for deltaMonths in range(-1, 2)]
 
-        if isinstance(meDF, pd.DataFrame):
-            meDF.to_csv(f'data/database/me/me_{itMonth}_{itYear}.csv', index=False)  
+    # all months are downloaded at the same time
+    contents = Fetcher.FetchMany([Functions.csv_url(itMonth, itYear) for itMonth, itYear in months])
+
+    changedMonths = []
+
+    for (itMonth, itYear), content in zip(months, contents):
+        meDF = Functions.content_to_dataframe(content) if content is not None else None
+
+        # if download fails, the csv already saved is kept
+        if meDF is not None:
+            if DataStore.Write(f'data/database/me/me_{itMonth}_{itYear}.csv', meDF.to_csv(index=False).encode()):
+                changedMonths.append((itMonth, itYear))
 
         # NOTE: PENDING REMOVAL
         # adwDF = Functions.csv_to_dataframe(itMonth, itYear, 'adw')
         # adwDF.to_csv(f'data/database/adw/adw_{itMonth}_{itYear}.csv', index=False)
     
-    with open('data/status.json') as status_json:
-        status_dict = load(status_json)
+    # months that are no longer the month before, current month or month after are removed
+    # (together with their layout, see SheetStore.Layout)
+    keep = {f'me_{itMonth}_{itYear}.{extension}' for itMonth, itYear in months for extension in ['csv', 'layout.json']}
+    for file in os.scandir('data/database/me'):
+        if re.fullmatch(r'me_\d+_\d+\.(csv|layout\.json)', file.name) and file.name not in keep:
+            os.remove(file)
+
+    # changed months (and months downloaded before History existed) are added to History
+    History.IngestDatabase()
 
-    status_dict['online sheets']['time'] = Functions.CurrentDatetime().strftime('%d/%m/%y at %#I:%M %p')
+    StateStore.SetStatus('online sheets', time=Functions.CurrentDatetime().strftime('%d/%m/%y at %#I:%M %p'))
 
-    with open('data/status.json', 'w') as status_json:
-        dump(status_dict, status_json, indent=1)
+    if all(content is not None for content in contents):
+        Ran('DownloadDatabase')
 
-def ObtainMergedCells():
+    return changedMonths
+
+mergedCellsURL = 'https://docs.google.com/spreadsheets/d/1rXLXxWMSpb8hU_BRuI87jv7wS04tB6yD'
+
+# if current month and month in database is the same, but merged cells sheet has not stopped updating, sheet with merged cells is needed
+# if current month and month in database is not the same, sheet with merged cells is needed
+def MergedCellsDue():
+    status_dict = StateStore.Status()
+
+    # obtain month last updated in database
+    month_in_database = int(datetime.datetime.strptime(status_dict['merged cells']['time'], '%d/%m/%y at %I:%M %p').strftime('%#m'))
     
+    # obtain current month
+    month_now = int(Functions.CurrentDatetime().strftime('%#m'))
+
+    return (month_in_database == month_now and not status_dict['merged cells']['stopped']) or month_in_database != month_now
+
+# withMerge    - cells of the sheet with merged cells (column 0 is the name, column x is day x)
+# withoutMerge - cells of the ME sheet, same rows and columns as withMerge
+# --> a merged block shows up as cells that are different in the 2 sheets (the 1st cell of the block is still the same),
+#     so every row is compared at once and each run of different cells is one merged block
+def FindMergedCells(withMerge, withoutMerge, year, month):
+    withMerge = np.asarray(withMerge, dtype=str)
+    withoutMerge = np.asarray(withoutMerge, dtype=str)
+
+    different = np.char.strip(np.char.upper(withMerge)) != np.char.strip(np.char.upper(withoutMerge))
+
+    # +1 where a run of different cells starts, -1 one cell after it ends (a column that is the same is added at both ends)
+    edges = np.diff(np.pad(different, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+    startRows, startColumns = np.nonzero(edges == 1)
+    endColumns = np.nonzero(edges == -1)[1]
+
+    mergedCells = []
+
+    for row, startColumn, endColumn in zip(startRows.tolist(), startColumns.tolist(), endColumns.tolist()):
+        mergedCells.append({
+            'sheetName': withMerge[row, 0].upper().strip(),
+            'sheetStatus': re.sub('\\s*/\\s*', '/', withMerge[row, startColumn - 1].strip().upper()),
+            'startDate': datetime.datetime(year, month, startColumn - 1).strftime('%d%m%y'),
+            'endDate': datetime.datetime(year, month, endColumn - 1).strftime('%d%m%y')
+        })
+
+    return mergedCells
+
+# mergedPage - Future from Fetcher.Submit(mergedCellsURL) if the sheet was already being downloaded
+def ObtainMergedCells(mergedPage=None):
+    # pandas is only imported when it is needed (read_html of the sheet with merged cells), not when the bot starts
+    import pandas as pd
+
     run_merged_cells = False
     
-    with open('data/status.json') as status_json:
-        status_dict = load(status_json)
+    status_dict = StateStore.Status()
 
     # obtain month last updated in database
     month_in_database = int(datetime.datetime.strptime(status_dict['merged cells']['time'], '%d/%m/%y at %I:%M %p').strftime('%#m'))
@@ -109,11 +227,10 @@ def ObtainMergedCells():
     month_now = int(Functions.CurrentDatetime().strftime('%#m'))
     year = int(Functions.CurrentDatetime().strftime('%Y'))
 
-    # if current month and month in database is the same, but merged cells sheet has not stopped updating, run this
-    # if current month and month in database is not the same, run this
     # this obtains the month of the online sheet 
-    if (month_in_database == month_now and not status_dict['merged cells']['stopped']) or month_in_database != month_now:
-        ME_df_with_merge = pd.read_html('https://docs.google.com/spreadsheets/d/1rXLXxWMSpb8hU_BRuI87jv7wS04tB6yD', index_col=0)[0].fillna('NIL')
+    if MergedCellsDue():
+        page = mergedPage.result() if mergedPage is not None else Fetcher.Fetch(mergedCellsURL)
+        ME_df_with_merge = pd.read_html(io.StringIO(page.decode('utf-8')), index_col=0)[0].fillna('NIL')
 
         # obtains month of online sheet
         month_in_sheet = None
@@ -137,7 +254,7 @@ def ObtainMergedCells():
         ME_df_with_merge = ME_df_with_merge.iloc[6:, [x for x in range(monthrange(year, month_in_sheet)[1] + 2) if x != 1]]
 
         # obtains the ME sheet with no merged cells
-        ME_df_without_merge = Functions.OpenSheet(datetime.datetime(year, month_in_sheet, 1), 'me')
+        ME_df_without_merge = pd.DataFrame(Functions.OpenSheet(datetime.datetime(year, month_in_sheet, 1), 'me'))
 
         # reindex columns for sheet with no merged cells
         ME_df_without_merge.columns = pd.RangeIndex(ME_df_without_merge.columns.size)
@@ -147,47 +264,13 @@ def ObtainMergedCells():
         ME_df_without_merge = ME_df_without_merge[ME_df_without_merge[ME_df_without_merge.columns[0]] != 'NIL']
         ME_df_without_merge = ME_df_without_merge.iloc[5:, [x for x in range(monthrange(year, month_in_sheet)[1] + 1)]]
 
-        # adds an extra column at the end of both dataframes
-        # this is to allow for the program to iterrate through the whole row in the while loop below
-        ME_df_with_merge['TEMP'] = 'NIL'
-        ME_df_without_merge['TEMP'] = 'NIL'
-
-        hit_merged_cell = False
-        merged_cells_list = []
-
         # obtain all the merged cells
-        for row in range(ME_df_with_merge.shape[0]):
-            for column in range(ME_df_with_merge.shape[1]):
-
-                cell_with_merge = ME_df_with_merge.iloc[row, column].upper().strip()
-                cell_without_merge = ME_df_without_merge.iloc[row, column].upper().strip()
-
-                # detects first instance of discrepancy (2nd cell of merged block)
-                if cell_with_merge != cell_without_merge:
-                    
-                    # obtains the start of merged cell and status
-                    if not hit_merged_cell:
-                        name_in_ps = ME_df_with_merge.iloc[row, 0].upper().strip()
-                        status_in_ps = re.sub('\s*/\s*', '/', ME_df_with_merge.iloc[row, column - 1].strip().upper())
-                        merge_start_column = column - 1
-                        hit_merged_cell = True         
-                else:
-                    
-                    # detects one cell after the end of merged block and saves data
-                    if hit_merged_cell:
-                        merge_end_column = column - 1
-                        merged_cells_list.append({'sheetName': name_in_ps, 'sheetStatus': status_in_ps, 'startDate': datetime.datetime(year, month_in_sheet, merge_start_column).strftime('%d%m%y'), 'endDate': datetime.datetime(year, month_in_sheet, merge_end_column).strftime('%d%m%y')})
-                        hit_merged_cell = False
+        merged_cells_list = FindMergedCells(ME_df_with_merge.values, ME_df_without_merge.values, year, month_in_sheet)
 
         # adds all the merged cells data to a json file
-        with open('data/override/merged_cells.json', 'w') as merged_cells_json:
-            dump(merged_cells_list, merged_cells_json, indent=1)
+        DataStore.Dump('data/override/merged_cells.json', merged_cells_list)
 
-        status_dict['merged cells']['stopped'] = False
-        status_dict['merged cells']['time'] = Functions.CurrentDatetime().strftime('%d/%m/%y at %#I:%M %p')
-
-        with open('data/status.json', 'w') as status_json:
-            dump(status_dict, status_json, indent=1)
+        StateStore.SetStatus('merged cells', time=Functions.CurrentDatetime().strftime('%d/%m/%y at %#I:%M %p'), stopped=False)
     else:
         
         # kind of updates merged_cells.json but like badly
@@ -195,8 +278,7 @@ def ObtainMergedCells():
         # <<< stuff the below does >>>
         # if unmerged cells has a duty on a merged cells day, remove status from merged_cells.json
         # if unmerged cells has a different status from the merged cells (1st day), remove status from merged_cells.json
-        with open('data/override/merged_cells.json') as merged_cells_json:
-            merged_cells_list = load(merged_cells_json)
+        merged_cells_list = DataStore.LoadCopy('data/override/merged_cells.json')
         
         for_checking = {}
 
@@ -209,24 +291,23 @@ def ObtainMergedCells():
             
             for_checking[x['sheetName']].append({'INDEX': index, 'STATUS_IN_PS': x['sheetStatus'], 'DATES': [y for y in range(start_date, end_date + 1)]})
         
-        ME_df = Functions.OpenSheet(datetime.datetime(year, month_in_database, 1), 'me')
+        ME_sheet = SheetStore.OpenME(datetime.datetime(year, month_in_database, 1))
+        layout = SheetStore.Layout((month_in_database, year), ME_sheet)
 
         to_be_deleted = []
         
-        for x in range(Global.TOP, Global.MIDDLE):
-            name_in_ps = ME_df.iloc[x, 0].upper().strip()
-            
+        for name_in_ps, x in layout.sheetRows.items():
             if name_in_ps in for_checking:
                 for status in for_checking[name_in_ps]:
                 
                     # if 1st day of merged cell status is different from ME_df, remove status from merged_cells.json
-                    if re.sub('\s*/\s*', '/', ME_df.iloc[x, status['DATES'][0]].upper().strip()) != status['STATUS_IN_PS']:
+                    if re.sub('\s*/\s*', '/', ME_sheet.rows[x][status['DATES'][0]].upper().strip()) != status['STATUS_IN_PS']:
                         to_be_deleted.append(status['INDEX'])
                         break
                     
                     # if duty or changeover present on any of the days in merged_cells.json, remove status from merged_cells.json
                     for date in status['DATES']:
-                        status_in_ps = re.sub('\s*/\s*', '/', ME_df.iloc[x, date].upper().strip())
+                        status_in_ps = re.sub('\s*/\s*', '/', ME_sheet.rows[x][date].upper().strip())
                         
                         if status_in_ps == 'X' or status_in_ps == '\\' or status_in_ps == 'SITE VCOMM':
                             to_be_deleted.append(status['INDEX'])
@@ -237,83 +318,24 @@ def ObtainMergedCells():
             del merged_cells_list[index]
         
         # indicating that the merged cells json has stopeed updating
-        status_dict['merged cells']['stopped'] = True
+        StateStore.SetStatus('merged cells', stopped=True)
+        DataStore.Dump('data/override/merged_cells.json', merged_cells_list)
 
-        with open('data/status.json', 'w') as status_json:
-            dump(status_dict, status_json, indent=1)
-        
-        with open('data/override/merged_cells.json', 'w') as merged_cells_json:
-            dump(merged_cells_list, merged_cells_json, indent=1)
+    Ran('ObtainMergedCells')
 
 def RemoveOutdated():
-    ref = {}
-
-    fileName = [
-        'parade_state_override',
-        'rations'
-    ]
-
-    filePath = [
-        'data/override/parade_state_override.json',
-        'data/override/rations.json'
-    ]
-
-    for name, path in zip(fileName, filePath):
-        with open(path) as file:
-            ref[name] = load(file)
-                    
-    ref['parade_state_override'] = [x for x in ref['parade_state_override'] if Functions.DateConverter(x['endDate']) > Functions.CurrentDatetime().replace(tzinfo=None)]
-    ref['rations'] = {k: v for k, v in ref['rations'].items() if k == 'everyday' or Functions.DateConverter(k) > Functions.CurrentDatetime().replace(tzinfo=None)}
+    nowDT = Functions.CurrentDatetime().replace(tzinfo=None)
 
-    for name, path in zip(fileName, filePath):
-        with open(path, 'w') as file:
-            dump(ref[name], file, indent=1)
-
-def GetGlobalVariables(dateDT=Functions.CurrentDatetime()):
-    meDF = Functions.OpenSheet(dateDT, 'me')
-
-    ref = {'sheetName': set(), 'commSec': set()}
-
-    for flight in ['alpha', 'bravo', 'others']:
-        with open(f'data/personnel/{flight}.json') as flightJson:
-            flightList = load(flightJson)
-        
-        for x in flightList:
-            ref['sheetName'].add(x['sheetName'])
+    # only the expired rows are deleted (found using the index on the end date)
+    StateStore.RemoveExpiredOverrides(nowDT)
+    StateStore.RemoveExpiredRations(nowDT)
 
-            if x['commSec'] != 'NIL':
-                ref['commSec'].add(x['commSec'])
+    Ran('RemoveOutdated')
 
-    for row in range(meDF.shape[0]):
-        target = meDF.iloc[row, 0].upper().strip()
-
-        if target in ref['sheetName']:
-            Global.TOP = row - 3
-            break
-
-    bottomHit = False
-
-    for row in range(meDF.shape[0] - 1, 0, -1):
-        target = meDF.iloc[row, 0].upper().strip()
-
-        if target == 'NIL':
-            continue
-
-        if not bottomHit:
-            if target in ref['commSec']:
-                Global.BOTTOM = row + 1
-                bottomHit = True
-        else:
-            if target in ref['commSec']:
-                Global.MIDDLE = row
-            else:
-                break
-
-def __MonthChecker(meDF, month, i, monthINT, meDFMonthRef):
+def __MonthChecker(meDF, month):
     for x in range(15):
         if re.search('[0-9]{1,2}-[A-Z]{3}',  meDF.iloc[x, 5].upper()):
             if meDF.iloc[x, 5].split('-')[1].upper() == month[:3]:
-                meDFMonthRef[monthINT] = month[:i]
                 return True
     return False
 
@@ -322,21 +344,43 @@ def GetmeDFMonthRef():
     currentMonthINT = dateDT.month
     currentYearINT = dateDT.year
 
-    with open('data/reference/meDF_month_ref.json') as file:
-        meDFMonthRef = load(file)
+    meDFMonthRef = DataStore.LoadCopy('data/reference/meDF_month_ref.json')
+    sheetNameRef = DataStore.LoadCopy('data/reference/sheet_name_ref.json')
 
     monthFullList = [x.upper() for x in list(calendar.month_name[1:])]
 
+    # every name (JAN, JANU, JANUA, ...) of the months not found before is tried at the same time
+    # KEY: Future of Fetcher.Submit | VALUE: (KEY in sheetNameRef, monthINT, name)
+    probes = {}
+
     for x in range(-1, 2):
         monthINT, year = Functions.timedelta_months(currentMonthINT, currentYearINT, x)
-        monthINT = monthINT - 1
-        month = monthFullList[monthINT]
+        key = f'{monthINT}/{year}'
 
+        if key in sheetNameRef:
+            meDFMonthRef[monthINT - 1] = sheetNameRef[key]
+            continue
+
+        month = monthFullList[monthINT - 1]
         for i in range(3, len(month) + 1):
-            meDF = pd.read_csv(f'https://docs.google.com/spreadsheets/d/1rXLXxWMSpb8hU_BRuI87jv7wS04tB6yD/gviz/tq?tqx=out:csv&sheet={month[:i]}%20{year}').fillna('NIL')
+            probes[Fetcher.Submit(Functions.sheet_url(month[:i], year))] = (key, monthINT, month[:i])
+
+    # names of a month are checked shortest first (same as trying them one by one), google returns the default sheet for names
+    # that do not exist, so a longer name can also pass for the default month, and the first request to finish is not used
+    # once a name passes, the longer names of that month are cancelled (or their results ignored)
+    for future, (key, monthINT, name) in probes.items():
+        if key in sheetNameRef:
+            future.cancel()
+            continue
 
-            if __MonthChecker(meDF, month, i, monthINT, meDFMonthRef):
-                break
-    
-    with open('data/reference/meDF_month_ref.json', 'w') as file:
-        meDFMonthRef = dump(meDFMonthRef, file, indent=1)
\ No newline at end of file
+        if future.exception() is not None:
+            continue
+
+        meDF = Functions.content_to_dataframe(future.result())
+
+        if meDF is not None and __MonthChecker(meDF, name):
+            sheetNameRef[key] = name
+            meDFMonthRef[monthINT - 1] = name
+
+    DataStore.Dump('data/reference/sheet_name_ref.json', sheetNameRef)
+    DataStore.Dump('data/reference/meDF_month_ref.json', meDFMonthRef)
@@ -0,0 +1,351 @@
+import os
+import hashlib
+import datetime
+import History
+import DataStore
+import Functions
+import numpy as np
+
+# |===============================================================================================================================|
+# |                                                                                                                               |
+# |                          ME AND ADW SHEETS PARSED ONCE AND KEPT IN MEMORY (used by ParadeState.py)                            |
+# |                                                                                                                               |
+# | --> Sheets are loaded through DataStore, so each csv file is only parsed again when the file changes                          |
+# |     (instead of pd.read_csv for every date in /we and /df)                                                                    |
+# | --> csv files are read with DataStore.ReadCSV (csv module and plain lists), pandas is never imported for /f, /we and /df      |
+# |                                                                                                                               |
+# | 1. OpenME(dateDT) - returns MonthSheet of the month of dateDT                                                                 |
+# |    --> taken from History.py if the month is kept there (kept in historyCache until the month is ingested again)              |
+# |    --> else from data/database/me/me_{month}_{year}.csv                                                                       |
+# |    --> if csv file does not exist, the sheet is downloaded once (Functions.OpenSheet(dateDT, "me", once=True)) but not kept   |
+# |        --> raises SheetUnavailable if the download fails (run.py replies that the sheet is unavailable)                       |
+# | 2. OpenMEs(monthKeys) - same as OpenME for every (month, year), months in History are read with ONE query                     |
+# | 3. MEVersion(dateDT)  - version of the sheet returned by OpenME(dateDT) (for caching results)                                 |
+# | 4. Layout(monthKey, meSheet) - SheetLayout of meSheet, worked out once per month and saved next to the csv                    |
+# |    --> data/database/me/me_{month}_{year}.layout.json, used again (also after a restart) until the csv or personnel change    |
+# |    --> only saved if the csv exists (months only in History keep their layout in meSheet.layouts)                             |
+# |    --> every month has its own layout, so a range over 2 months reads each month with the correct rows                        |
+# | 5. OpenADW()      - returns SheetRows of data/database/adw/adw.csv                                                            |
+# | 6. OpenADWIndex() - returns AdwIndex of data/database/adw/adw.csv, data/reference/callsign_ref.json and the adw in History    |
+# |    --> only built again when one of them (or adw_month.json) changes                                                          |
+# | 7. ADWMonth()     - (month, year) adw.csv is for, from data/database/adw/adw_month.json (written by /ae)                      |
+# |    --> if adw_month.json does not exist (adw.csv saved before /ae wrote it), the month adw.csv was last changed in            |
+# | 8. ADWVersion()   - version of the AdwIndex from OpenADWIndex() (for caching results, see ParadeState.ResultVersion)          |
+# |                                                                                                                               |
+# | CLASSES AND THEIR ATTRIBUTES:                                                                                                 |
+# | 1. SheetRows                                                                                                                  |
+# |     --> LIST rows - rows of the sheet (same rows and columns as .iloc of the dataframe)                                       |
+# | 2. MonthSheet (Inherited from SheetRows)                                                                                      |
+# |     --> LIST names - column 0 of every row (uppercase and whitespace removed)                                                 |
+# |     --> STR digest - hash of the csv the sheet was made from (None if the sheet was downloaded and not saved)                 |
+# |     --> NDARRAY grid - rows as a 2D numpy array (for the range engine in ParadeState.py)                                      |
+# |     --> DICT layouts - KEY: hash of personnel files | VALUE: SheetLayout of this sheet, from Layout(monthKey, meSheet)        |
+# | 3. SheetLayout                                                                                                                |
+# |     --> INT top, middle, bottom - rows (top: first sheetName - 3, middle: first commSec, bottom: last commSec + 1)            |
+# |         --> sheetStatus between top and middle is not overridden by commSec between middle and bottom if they are the same    |
+# |     --> DICT sheetRows - KEY: sheetName | VALUE: INT row (rows between top and middle, name is not NIL)                       |
+# |         --> if a name is present twice, the lower row is used                                                                 |
+# |     --> DICT commSecRows - KEY: commSec | VALUE: INT row (rows between middle and bottom, in order, first row is used)        |
+# | 4. AdwIndex                                                                                                                   |
+# |     --> LIST slots - KEY: column | VALUE: LIST of cells in that column for every row (G1, G2, G3A, G3S, G1 SB, ...)           |
+# |         --> cells are uppercase and whitespace removed (as displayed in the parade state)                                     |
+# |         --> column 1 is the last day of the previous month, column x + 1 is day x                                             |
+# |     --> LIST dutyStatuses - KEY: column | VALUE: LIST of (sheetName, "R"/"HFD") of callsigns in G1, G2 and G3A                |
+# |         --> cells are split by '/' (eg. CHIMNEY/DIVA(R) --> CHIMNEY is "HFD" and DIVA is "R")                                 |
+# |         --> callsigns that are not in callsign_ref.json are left out                                                          |
+# |     --> DICT callsignToSheet - KEY: callsign (as split from cell) | VALUE: sheetName (None if not in callsign_ref.json)       |
+# |         --> callsign is first matched exactly (without (R) and whitespace), if that fails,                                    |
+# |             the first callsign in callsign_ref.json that is inside the callsign is used                                       |
+# |     --> SET callsignSheetNames - all sheetNames in callsign_ref.json                                                          |
+# |     --> DICT adwDays - KEY: date ordinal | VALUE: LIST of cells of that day, from History.ADWDays()                           |
+# |     --> Slots(dateDT, previous) / DutyStatuses(dateDT, previous) - slots/dutyStatuses of dateDT (or the day before)           |
+# |         --> days in adwDays are used first, else column dateDT.day + 1 (dateDT.day if previous) of adw.csv                    |
+# |         --> adw.csv is only used for days of the month it is for (from ADWMonth()), other days not in adwDays                 |
+# |             are UNKNOWN slots and no dutyStatuses (adw.csv of another month is never shown)                                   |
+# |                                                                                                                               |
+# |===============================================================================================================================|
+
+class SheetRows:
+    def __init__(self, rows):
+        self.rows = rows
+
+class MonthSheet(SheetRows):
+    def __init__(self, rows, digest=None):
+        super().__init__(rows)
+
+        self.digest = digest
+        self.names = [x[0].upper().strip() if isinstance(x[0], str) else x[0] for x in self.rows]
+        self.grid = None
+        self.layouts = {}
+
+    def Layout(self, sheetNames, commSecs):
+        top, middle, bottom = 0, 0, 0
+
+        for row in range(len(self.rows)):
+            if self.names[row] in sheetNames:
+                top = row - 3
+                break
+
+        bottomHit = False
+
+        for row in range(len(self.rows) - 1, 0, -1):
+            target = self.names[row]
+
+            if target == 'NIL':
+                continue
+
+            if not bottomHit:
+                if target in commSecs:
+                    bottom = row + 1
+                    bottomHit = True
+            else:
+                if target in commSecs:
+                    middle = row
+                else:
+                    break
+
+        sheetRows = {}
+        for x in range(top, middle):
+            if self.rows[x][0] != 'NIL' and isinstance(self.names[x], str):
+                sheetRows[self.names[x]] = x
+
+        commSecRows = {}
+        for x in range(middle, bottom):
+            if self.rows[x][0] != 'NIL' and isinstance(self.names[x], str):
+                commSecRows.setdefault(self.names[x], x)
+
+        return SheetLayout(top, middle, bottom, sheetRows, commSecRows)
+
+    def Grid(self):
+        if self.grid is None:
+            self.grid = np.empty((len(self.rows), len(self.rows[0]) if self.rows else 0), dtype=object)
+            self.grid[:, :] = self.rows
+
+        return self.grid
+
+class SheetLayout:
+    def __init__(self, top, middle, bottom, sheetRows, commSecRows):
+        self.top = top
+        self.middle = middle
+        self.bottom = bottom
+        self.sheetRows = sheetRows
+        self.commSecRows = commSecRows
+
+    def ToJSON(self):
+        return {'top': self.top, 'middle': self.middle, 'bottom': self.bottom, 'sheetRows': self.sheetRows, 'commSecRows': self.commSecRows}
+
+class AdwIndex:
+    def __init__(self, adwSheet, callsignRef, adwDays, adwMonth):
+        self.callsignRef = callsignRef
+        self.callsignSheetNames = set(callsignRef.values())
+        self.callsignToSheet = {}
+
+        self.slots = []
+        self.dutyStatuses = []
+
+        for column in range(len(adwSheet.rows[0]) if adwSheet.rows else 0):
+            self.slots.append([row[column].upper().strip() for row in adwSheet.rows])
+            self.dutyStatuses.append(self.__DutyStatuses(self.slots[column]))
+
+        self.adwDays = adwDays
+        self.dayDutyStatuses = {}
+
+        # ordinal of column 1 (last day of the previous month) and of the last column of the month adw.csv is for
+        month, year = adwMonth
+        self.firstOrdinal = datetime.date(year, month, 1).toordinal() - 1
+        self.lastOrdinal = min(self.firstOrdinal + len(self.slots) - 2, datetime.date(year + month // 12, month % 12 + 1, 1).toordinal() - 1)
+        self.unknownSlots = ['UNKNOWN'] * len(adwSheet.rows)
+
+    def __DutyStatuses(self, cells):
+        dutyStatuses = []
+
+        for cell in cells[:3]:
+            for callsign in cell.split('/'):
+                sheetName = self.SheetName(callsign)
+
+                if sheetName is not None:
+                    dutyStatuses.append((sheetName, 'R' if '(R)' in callsign else 'HFD'))
+
+        return dutyStatuses
+
+    # column of adw.csv for the day ordinal (None if adw.csv is for another month)
+    def __Column(self, ordinal):
+        if self.firstOrdinal <= ordinal <= self.lastOrdinal:
+            return ordinal - self.firstOrdinal + 1
+
+        return None
+
+    # cells of dateDT (or the day before if previous) from History, else from adw.csv (column dateDT.day + 1)
+    def Slots(self, dateDT, previous=False):
+        ordinal = dateDT.toordinal() - previous
+        cells = self.adwDays.get(ordinal)
+
+        if cells is None:
+            column = self.__Column(ordinal)
+            return self.unknownSlots if column is None else self.slots[column]
+
+        return cells
+
+    def DutyStatuses(self, dateDT, previous=False):
+        ordinal = dateDT.toordinal() - previous
+
+        if ordinal not in self.adwDays:
+            column = self.__Column(ordinal)
+            return [] if column is None else self.dutyStatuses[column]
+
+        if ordinal not in self.dayDutyStatuses:
+            self.dayDutyStatuses[ordinal] = self.__DutyStatuses(self.adwDays[ordinal])
+
+        return self.dayDutyStatuses[ordinal]
+
+    def SheetName(self, callsign):
+        if callsign not in self.callsignToSheet:
+            sheetName = self.callsignRef.get(callsign.replace('(R)', '').strip())
+
+            if sheetName is None:
+                for x in self.callsignRef:
+                    if x in callsign:
+                        sheetName = self.callsignRef[x]
+                        break
+
+            self.callsignToSheet[callsign] = sheetName
+
+        return self.callsignToSheet[callsign]
+
+def ParseMonthSheet(content):
+    return MonthSheet(DataStore.ReadCSV(content), hashlib.blake2b(content, digest_size=16).hexdigest())
+
+def ParseSheetRows(content):
+    return SheetRows(DataStore.ReadCSV(content))
+
+# KEY: (month, year) | VALUE: (History.Version, MonthSheet)
+historyCache = {}
+
+# raised by OpenME when the sheet of a month is not kept and cannot be downloaded
+class SheetUnavailable(Exception):
+    def __init__(self, month, year):
+        super().__init__(f'ME sheet of {month}/{year} is unavailable, try again later')
+        self.month = month
+        self.year = year
+
+def OpenMEs(monthKeys):
+    # months in History that are not in historyCache (or are outdated) are read with one query
+    versions = {x: History.Version(*x) for x in monthKeys}
+    outdated = [x for x in monthKeys if versions[x] is not None and historyCache.get(x, (None,))[0] != versions[x]]
+
+    if outdated:
+        for monthKey, rows in History.MonthRows(outdated).items():
+            historyCache[monthKey] = (versions[monthKey], MonthSheet(rows, History.Hash(*monthKey)))
+
+    return {x: OpenME(datetime.datetime(x[1], x[0], 1)) for x in monthKeys}
+
+def OpenME(dateDT: datetime.datetime):
+    monthKey = (dateDT.month, dateDT.year)
+    version = History.Version(*monthKey)
+
+    if version is not None:
+        cached = historyCache.get(monthKey)
+
+        if cached is None or cached[0] != version:
+            cached = (version, MonthSheet(History.MonthRows([monthKey])[monthKey], History.Hash(*monthKey)))
+            historyCache[monthKey] = cached
+        
+        return cached[1]
+
+    # month not in History yet
+    try:
+        return DataStore.Load(CSVPath(dateDT.month, dateDT.year), ParseMonthSheet)
+    except FileNotFoundError:
+        rows = Functions.OpenSheet(dateDT, 'me', once=True)
+
+        if rows is None:
+            raise SheetUnavailable(dateDT.month, dateDT.year)
+
+        return MonthSheet(rows)
+
+personnelPaths = [f'data/personnel/{flight}.json' for flight in ['alpha', 'bravo', 'others']]
+
+def CSVPath(month, year):
+    return f'data/database/me/me_{month}_{year % 100}.csv'
+
+def LayoutPath(month, year):
+    return f'data/database/me/me_{month}_{year % 100}.layout.json'
+
+# SheetLayout of meSheet (the sheet of (month, year))
+def Layout(monthKey, meSheet):
+    personnelHash = DataStore.Hash(*personnelPaths)
+    layout = meSheet.layouts.get(personnelHash)
+
+    if layout is not None:
+        return layout
+
+    layoutPath = LayoutPath(*monthKey)
+
+    # saved layout is only used if it was made from the same sheet and the same personnel files
+    if meSheet.digest is not None and os.path.exists(layoutPath):
+        saved = DataStore.Load(layoutPath)
+
+        if saved['sheetHash'] == meSheet.digest and saved['personnelHash'] == personnelHash:
+            layout = SheetLayout(saved['top'], saved['middle'], saved['bottom'], saved['sheetRows'], saved['commSecRows'])
+
+    if layout is None:
+        sheetNames = set()
+        commSecs = set()
+
+        for path in personnelPaths:
+            for x in DataStore.Load(path):
+                sheetNames.add(x['sheetName'])
+
+                if x['commSec'] != 'NIL':
+                    commSecs.add(x['commSec'])
+
+        layout = meSheet.Layout(sheetNames, commSecs)
+
+        # sheets that were downloaded but not saved (no digest) are not saved either
+        # months only in History have no csv (DownloadDatabase removes layouts without one), so their layout is only kept in memory
+        if meSheet.digest is not None and os.path.exists(CSVPath(*monthKey)):
+            DataStore.Dump(layoutPath, {'sheetHash': meSheet.digest, 'personnelHash': personnelHash, **layout.ToJSON()})
+
+    meSheet.layouts[personnelHash] = layout
+
+    return layout
+
+# changes every time the sheet returned by OpenME(dateDT) changes (raises FileNotFoundError if the sheet has to be downloaded)
+def MEVersion(dateDT: datetime.datetime):
+    version = History.Version(dateDT.month, dateDT.year)
+
+    if version is not None:
+        return ('history', version)
+
+    return DataStore.Version(CSVPath(dateDT.month, dateDT.year))
+
+# month and year adw.csv is for, saved when it is uploaded (ExcelProcesser.EditADWExcelSheet)
+adwMonthPath = 'data/database/adw/adw_month.json'
+
+def OpenADW():
+    return DataStore.Load('data/database/adw/adw.csv', ParseSheetRows)
+
+# (month, year) adw.csv is for, from adw_month.json (written by /ae), else the month adw.csv was last changed in
+def ADWMonth():
+    if os.path.exists(adwMonthPath):
+        adwMonth = DataStore.Load(adwMonthPath)
+        return adwMonth['month'], adwMonth['year']
+
+    changed = datetime.date.fromtimestamp(os.path.getmtime('data/database/adw/adw.csv'))
+    return changed.month, changed.year
+
+adwIndexCache = {'version': None, 'index': None}
+
+# changes every time the AdwIndex returned by OpenADWIndex() changes (also used for the version of results in ParadeState.py)
+def ADWVersion():
+    version = DataStore.Version('data/database/adw/adw.csv', 'data/reference/callsign_ref.json') + (History.ADWVersion(),)
+    return version + (DataStore.Version(adwMonthPath) if os.path.exists(adwMonthPath) else (None,))
+
+def OpenADWIndex():
+    version = ADWVersion()
+
+    if adwIndexCache['version'] != version:
+        adwIndexCache['index'] = AdwIndex(OpenADW(), DataStore.Load('data/reference/callsign_ref.json'), History.ADWDays(), ADWMonth())
+        adwIndexCache['version'] = version
+
+    return adwIndexCache['index']
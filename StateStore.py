@@ -0,0 +1,298 @@
+import os
+import sqlite3
+import datetime
+import threading
+import DataStore
+
+# |===============================================================================================================================|
+# |                                                                                                                               |
+# |                  OVERRIDES, RATIONS, USERNAMES AND STATUS ARE KEPT IN data/state.db (SQLite, WAL mode)                        |
+# |                                                                                                                               |
+# | --> Every edit is ONE small transaction (eg. adding one override only inserts one row),                                       |
+# |     instead of loading the whole json file, changing it and saving the whole file again                                       |
+# |     (two people editing at the same time could overwrite each other's changes)                                                |
+# | --> The first time data/state.db is opened, everything in the json files below is copied into it (migration)                  |
+# |     --> data/override/parade_state_override.json  -> TABLE overrides                                                          |
+# |     --> data/override/rations.json                -> TABLE rations                                                            |
+# |     --> data/reference/username_ref.json          -> TABLE users                                                              |
+# |     --> data/status.json                          -> TABLE status                                                             |
+# | --> Export() saves everything back into the json files (python StateStore.py)                                                 |
+# |                                                                                                                               |
+# | READING (returned objects are in the same format as the json files, SHARED between everyone, DO NOT change them):             |
+# | 1. Overrides() - LIST of {sheetName, sheetStatus, startDate, endDate} in the order they were added                            |
+# | 2. Rations()   - DICT KEY: DDMMYY/everyday | VALUE: [breakfast pax, lunch pax, dinner pax]                                    |
+# | 3. Users()     - DICT KEY: chatID | VALUE: {cos, username}                                                                    |
+# | 4. Status()    - DICT KEY: name (eg. online sheets) | VALUE: {stopped, time}                                                  |
+# | 5. DeadChats() - DICT KEY: chatID | VALUE: {reason, time} (chats that blocked the bot, skipped by Broadcaster.py)             |
+# | --> Each table is only read from the database again after it is changed                                                       |
+# | 6. FileIDs()   - DICT KEY: hash of a document sent | VALUE: telegram file_id of that document (used by Documents.py)          |
+# | 7. LastRuns()  - DICT KEY: name of a refresh in Scheduled.py | VALUE: time it last ran (ISO format, see Scheduled.Due)        |
+# | 8. Version(*tables) - tuple of the versions of the tables given (changes every time the table is changed, for caching)        |
+# |                                                                                                                               |
+# | WRITING:                                                                                                                      |
+# | 1. AddOverride(entry) / RemoveOverride(entry) / RemoveExpiredOverrides(nowDT)                                                 |
+# | 2. SetRations(date, pax) / RemoveRations(date) / RemoveExpiredRations(nowDT)                                                  |
+# | 3. SetUser(chatID, username) / SetCos(chatID, cos)                                                                            |
+# |    AddDeadChats(deadChats, time) - SetUser removes the chat from deadChats                                                    |
+# | 4. SetFileID(digest, fileID) / RemoveFileID(digest)                                                                           |
+# | 5. SetLastRun(name, time)                                                                                                     |
+# | 6. SetStatus(name, time, stopped) - only the values given are changed                                                         |
+# | --> RemoveExpired_(nowDT) use the index on the end date, and return the number of rows removed                                |
+# |                                                                                                                               |
+# |===============================================================================================================================|
+
+databasePath = 'data/state.db'
+
+jsonPaths = {
+    'overrides': 'data/override/parade_state_override.json',
+    'rations': 'data/override/rations.json',
+    'users': 'data/reference/username_ref.json',
+    'status': 'data/status.json'
+}
+
+schema = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS overrides (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sheetName TEXT NOT NULL,
+    sheetStatus TEXT NOT NULL,
+    startDate TEXT NOT NULL,
+    endDate TEXT NOT NULL,
+    startOrd INTEGER NOT NULL,
+    endOrd INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS overridesEnd ON overrides (endOrd);
+CREATE INDEX IF NOT EXISTS overridesStart ON overrides (startOrd);
+CREATE TABLE IF NOT EXISTS rations (
+    date TEXT PRIMARY KEY,
+    ord INTEGER,
+    breakfast INTEGER NOT NULL,
+    lunch INTEGER NOT NULL,
+    dinner INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rationsOrd ON rations (ord);
+CREATE TABLE IF NOT EXISTS users (chatID TEXT PRIMARY KEY, cos TEXT NOT NULL, username TEXT);
+CREATE TABLE IF NOT EXISTS status (name TEXT PRIMARY KEY, stopped INTEGER NOT NULL, time TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS deadChats (chatID TEXT PRIMARY KEY, reason TEXT, time TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS fileIDs (hash TEXT PRIMARY KEY, fileID TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS lastRuns (name TEXT PRIMARY KEY, time TEXT NOT NULL);
+'''
+
+state = {'db': None}
+lock = threading.RLock()
+versionCounter = [0]
+versions = {}
+readCache = {}
+
+def __Ordinal(dateRAW):
+    return datetime.datetime.strptime(dateRAW, '%d%m%y').toordinal()
+
+def __Bump(*tables):
+    for table in tables:
+        versionCounter[0] += 1
+        versions[table] = versionCounter[0]
+
+def __Migrate(db):
+    def Source(table, default):
+        if os.path.exists(jsonPaths[table]):
+            return DataStore.Load(jsonPaths[table])
+        return default
+
+    db.executemany(
+        'INSERT INTO overrides (sheetName, sheetStatus, startDate, endDate, startOrd, endOrd) VALUES (?, ?, ?, ?, ?, ?)',
+        [(x['sheetName'], x['sheetStatus'], x['startDate'], x['endDate'], __Ordinal(x['startDate']), __Ordinal(x['endDate'])) for x in Source('overrides', [])]
+    )
+    db.executemany(
+        'INSERT INTO rations (date, ord, breakfast, lunch, dinner) VALUES (?, ?, ?, ?, ?)',
+        [(date, None if date == 'everyday' else __Ordinal(date), *pax) for date, pax in Source('rations', {'everyday': [0, 0, 0]}).items()]
+    )
+    db.executemany(
+        'INSERT INTO users (chatID, cos, username) VALUES (?, ?, ?)',
+        [(chatID, x['cos'], x['username']) for chatID, x in Source('users', {}).items()]
+    )
+    db.executemany(
+        'INSERT INTO status (name, stopped, time) VALUES (?, ?, ?)',
+        [(name, int(x['stopped']), x['time']) for name, x in Source('status', {}).items()]
+    )
+    db.execute("INSERT INTO meta (key, value) VALUES ('migrated', ?)", (datetime.datetime.now().isoformat(),))
+
+def __Database():
+    if state['db'] is None:
+        with lock:
+            if state['db'] is None:
+                db = sqlite3.connect(databasePath, check_same_thread=False, isolation_level=None)
+                db.execute('PRAGMA journal_mode=WAL')
+                db.execute('PRAGMA synchronous=NORMAL')
+                db.executescript(schema)
+
+                if db.execute("SELECT 1 FROM meta WHERE key = 'migrated'").fetchone() is None:
+                    db.execute('BEGIN IMMEDIATE')
+                    try:
+                        __Migrate(db)
+                        db.execute('COMMIT')
+                    except:
+                        db.execute('ROLLBACK')
+                        raise
+
+                __Bump(*jsonPaths, 'deadChats', 'fileIDs', 'lastRuns')
+                state['db'] = db
+
+    return state['db']
+
+# runs func(db) in one transaction, tables changed get a new version
+def __Write(tables, func):
+    db = __Database()
+
+    with lock:
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            result = func(db)
+            db.execute('COMMIT')
+        except:
+            db.execute('ROLLBACK')
+            raise
+
+        __Bump(*tables)
+
+    return result
+
+def __Read(table, query, build):
+    db = __Database()
+
+    with lock:
+        cached = readCache.get(table)
+
+        if cached is None or cached[0] != versions[table]:
+            cached = (versions[table], build(db.execute(query).fetchall()))
+            readCache[table] = cached
+
+    return cached[1]
+
+def Version(*tables):
+    __Database()
+    return tuple(versions[table] for table in tables)
+
+def Overrides():
+    return __Read(
+        'overrides',
+        'SELECT sheetName, sheetStatus, startDate, endDate FROM overrides ORDER BY id',
+        lambda rows: [{'sheetName': x[0], 'sheetStatus': x[1], 'startDate': x[2], 'endDate': x[3]} for x in rows]
+    )
+
+def Rations():
+    return __Read(
+        'rations',
+        'SELECT date, breakfast, lunch, dinner FROM rations ORDER BY rowid',
+        lambda rows: {x[0]: [x[1], x[2], x[3]] for x in rows}
+    )
+
+def Users():
+    return __Read(
+        'users',
+        'SELECT chatID, cos, username FROM users ORDER BY rowid',
+        lambda rows: {x[0]: {'cos': x[1], 'username': x[2]} for x in rows}
+    )
+
+def Status():
+    return __Read(
+        'status',
+        'SELECT name, stopped, time FROM status ORDER BY rowid',
+        lambda rows: {x[0]: {'stopped': bool(x[1]), 'time': x[2]} for x in rows}
+    )
+
+def DeadChats():
+    return __Read(
+        'deadChats',
+        'SELECT chatID, reason, time FROM deadChats ORDER BY rowid',
+        lambda rows: {x[0]: {'reason': x[1], 'time': x[2]} for x in rows}
+    )
+
+def FileIDs():
+    return __Read('fileIDs', 'SELECT hash, fileID FROM fileIDs', dict)
+
+def LastRuns():
+    return __Read('lastRuns', 'SELECT name, time FROM lastRuns', dict)
+
+def AddOverride(entry):
+    __Write(['overrides'], lambda db: db.execute(
+        'INSERT INTO overrides (sheetName, sheetStatus, startDate, endDate, startOrd, endOrd) VALUES (?, ?, ?, ?, ?, ?)',
+        (entry['sheetName'], entry['sheetStatus'], entry['startDate'], entry['endDate'], __Ordinal(entry['startDate']), __Ordinal(entry['endDate']))
+    ))
+
+def RemoveOverride(entry):
+    return __Write(['overrides'], lambda db: db.execute(
+        'DELETE FROM overrides WHERE sheetName = ? AND sheetStatus = ? AND startDate = ? AND endDate = ?',
+        (entry['sheetName'], entry['sheetStatus'], entry['startDate'], entry['endDate'])
+    ).rowcount)
+
+# overrides that ended before nowDT (endDate <= date of nowDT)
+def RemoveExpiredOverrides(nowDT):
+    return __Write(['overrides'], lambda db: db.execute('DELETE FROM overrides WHERE endOrd <= ?', (nowDT.toordinal(),)).rowcount)
+
+def SetRations(date, pax):
+    __Write(['rations'], lambda db: db.execute(
+        'INSERT INTO rations (date, ord, breakfast, lunch, dinner) VALUES (?, ?, ?, ?, ?) '
+        'ON CONFLICT (date) DO UPDATE SET breakfast = excluded.breakfast, lunch = excluded.lunch, dinner = excluded.dinner',
+        (date, None if date == 'everyday' else __Ordinal(date), *pax)
+    ))
+
+def RemoveRations(date):
+    return __Write(['rations'], lambda db: db.execute('DELETE FROM rations WHERE date = ?', (date,)).rowcount)
+
+# rations of dates before nowDT (everyday is never removed)
+def RemoveExpiredRations(nowDT):
+    return __Write(['rations'], lambda db: db.execute('DELETE FROM rations WHERE ord <= ?', (nowDT.toordinal(),)).rowcount)
+
+# user (re)starting the bot, cos is reset (and the chat is no longer dead)
+def SetUser(chatID, username):
+    def Update(db):
+        db.execute(
+            'INSERT INTO users (chatID, cos, username) VALUES (?, ?, ?) '
+            "ON CONFLICT (chatID) DO UPDATE SET cos = '', username = excluded.username",
+            (str(chatID), '', username)
+        )
+        db.execute('DELETE FROM deadChats WHERE chatID = ?', (str(chatID),))
+
+    __Write(['users', 'deadChats'], Update)
+
+def SetCos(chatID, cos):
+    __Write(['users'], lambda db: db.execute(
+        'INSERT INTO users (chatID, cos, username) VALUES (?, ?, NULL) ON CONFLICT (chatID) DO UPDATE SET cos = excluded.cos',
+        (str(chatID), cos)
+    ))
+
+# chats that blocked the bot or no longer exist (deadChats - DICT KEY: chatID | VALUE: reason)
+def AddDeadChats(deadChats, time):
+    __Write(['deadChats'], lambda db: db.executemany(
+        'INSERT OR REPLACE INTO deadChats (chatID, reason, time) VALUES (?, ?, ?)',
+        [(str(chatID), reason, time) for chatID, reason in deadChats.items()]
+    ))
+
+def SetFileID(digest, fileID):
+    __Write(['fileIDs'], lambda db: db.execute('INSERT OR REPLACE INTO fileIDs (hash, fileID) VALUES (?, ?)', (digest, fileID)))
+
+def RemoveFileID(digest):
+    return __Write(['fileIDs'], lambda db: db.execute('DELETE FROM fileIDs WHERE hash = ?', (digest,)).rowcount)
+
+def SetLastRun(name, time):
+    __Write(['lastRuns'], lambda db: db.execute('INSERT OR REPLACE INTO lastRuns (name, time) VALUES (?, ?)', (name, time)))
+
+def SetStatus(name, time=None, stopped=None):
+    def Update(db):
+        db.execute("INSERT OR IGNORE INTO status (name, stopped, time) VALUES (?, 0, '')", (name,))
+
+        if time is not None:
+            db.execute('UPDATE status SET time = ? WHERE name = ?', (time, name))
+        if stopped is not None:
+            db.execute('UPDATE status SET stopped = ? WHERE name = ?', (int(stopped), name))
+
+    __Write(['status'], Update)
+
+def Export():
+    DataStore.Dump(jsonPaths['overrides'], Overrides())
+    DataStore.Dump(jsonPaths['rations'], Rations())
+    DataStore.Dump(jsonPaths['users'], Users())
+    DataStore.Dump(jsonPaths['status'], Status())
+
+if __name__ == '__main__':
+    Export()
@@ -0,0 +1,99 @@
+import os
+import asyncio
+import functools
+import threading
+import Profiler
+from telegram.ext import Application
+from concurrent.futures import ThreadPoolExecutor
+
+# |===============================================================================================================================|
+# |                                                                                                                               |
+# |                    RUNS BLOCKING WORK (pandas, openpyxl, google sheets requests) OUTSIDE OF THE EVENT LOOP                    |
+# |                                                                                                                               |
+# | --> All handlers in run.py are async, so anything slow ran directly inside them stops the bot from answering everyone else.   |
+# |     Slow work is sent to a pool of threads instead, and the handler waits for it without blocking the other chats.            |
+# |                                                                                                                               |
+# | Limits (from .env, optional):                                                                                                 |
+# | --> WORKER_LIMIT - max number of threads doing blocking work at the same time (default 4)                                     |
+# | --> UPDATE_LIMIT - max number of updates handled at the same time (default 32, used in ApplicationBuilder)                    |
+# |                                                                                                                               |
+# | FUNCTIONS:                                                                                                                    |
+# | 1. Run(func, *args, **kwargs)        - runs func in the worker pool and returns its result (await it)                         |
+# |    --> func is ran under cProfile if the command that called Run() is being profiled (see Profiler.py)                        |
+# | 2. MakeFile(path, func, *args)       - runs func (which saves a file at path) and returns the file as bytes                   |
+# | 3. UseFile(path, content, func, *args) - saves content at path and runs func (which reads the file at path)                   |
+# |    --> files in data/excel files have fixed paths, so only one request can use the same path at a time                        |
+# | 4. UpdateLimit()                     - UPDATE_LIMIT from .env                                                                 |
+# | 5. Iterate(generator)                - async for item in Iterate(generator), each item is made in the worker pool             |
+# |    --> eg. /we sends each day as soon as it is made                                                                           |
+# |                                                                                                                               |
+# | CLASS OrderedApplication (Inherited from telegram.ext.Application):                                                           |
+# | --> Updates from different chats are handled at the same time, but updates from the SAME chat are handled one at a time,      |
+# |     in the order they were sent (so conversations like /oe still go through their states in the correct order)                |
+# | --> DICT chatLocks - KEY: chatID | VALUE: asyncio.Lock                                                                        |
+# |                                                                                                                               |
+# |===============================================================================================================================|
+
+pool = {'executor': None}
+poolLock = threading.Lock()
+fileLocks = {}
+
+def __Executor():
+    if pool['executor'] is None:
+        with poolLock:
+            if pool['executor'] is None:
+                pool['executor'] = ThreadPoolExecutor(max_workers=int(os.getenv('WORKER_LIMIT', 4)), thread_name_prefix='worker')
+
+    return pool['executor']
+
+def UpdateLimit():
+    return int(os.getenv('UPDATE_LIMIT', 32))
+
+async def Run(func, *args, **kwargs):
+    call = functools.partial(func, *args, **kwargs)
+
+    # command is being profiled (see Profiler.py), so this call is profiled in the worker thread
+    capture = Profiler.Active()
+    if capture is not None:
+        call = functools.partial(capture.RunCall, call)
+
+    return await asyncio.get_running_loop().run_in_executor(__Executor(), call)
+
+async def Iterate(generator):
+    done = object()
+
+    while True:
+        item = await Run(next, generator, done)
+
+        if item is done:
+            return
+
+        yield item
+
+def MakeFile(path, func, *args):
+    with fileLocks.setdefault(path, threading.Lock()):
+        func(*args)
+
+        with open(path, 'rb') as file:
+            return file.read()
+
+def UseFile(path, content, func, *args):
+    with fileLocks.setdefault(path, threading.Lock()):
+        with open(path, 'wb') as file:
+            file.write(content)
+
+        return func(*args)
+
+class OrderedApplication(Application):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.chatLocks = {}
+
+    async def process_update(self, update):
+        chat = getattr(update, 'effective_chat', None)
+
+        if chat is None:
+            return await super().process_update(update)
+
+        async with self.chatLocks.setdefault(chat.id, asyncio.Lock()):
+            return await super().process_update(update)
@@ -1,12 +1,21 @@
 import os
 import re
 import datetime
+import Workers
+import Broadcaster
+import Documents
+import History
+import DataStore
+import StateStore
+import SheetStore
 import Scheduled
 import Functions
+import Metrics
+import Profiler
+import OverrideIndex
 import ExcelProcesser
 import DateChecker
 import ParadeState as ps
-from ujson import load, dump
 from dotenv import load_dotenv
 from telegram import ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import filters, ApplicationBuilder, CommandHandler, MessageHandler, ConversationHandler
@@ -16,30 +25,34 @@ from telegram.ext import filters, ApplicationBuilder, CommandHandler, MessageHan
 # |                                   !!! RUN THIS FILE !!!                                          |
 # |                                                                                                  |
 # | 1. Loads in variable API_KEY from .env file                                                      |
-# | 2. Runs Scheduled.GetGlobalVariables() once, when file is ran                                    |
-# |    --> subsequently runs last day of every month to update global variable for the next month    |
+# | 2. Each month's rows (TOP, MIDDLE, BOTTOM) are found when the month is first used                |
+# |    --> see SheetStore.Layout, saved next to the csv in data/database/me                          |
 # | 3. Contains all the scheduling of functions in Scheduled.py                                      |
 # |    --> can be found under bot.job_queue.(run_repeating/run_daily/run_monthly)                    |
+# |    --> run_once(StartupRefresh) - bot starts from data on disk, outdated data is downloaded after|
 # | 4. Contains all the functions for each command in the bot                                        |
 # |    --> can be found under bot.add_handler                                                        |
 # | 5. bot.run_polling() - polls telegram to check for command sent                                  |
+# | 6. Slow work (parade states, excel files, downloads) is ran in Workers.Run() so other chats      |
+# |    are still answered, updates from the same chat are handled in order (see Workers.py)          |
+# | 7. /broadcast is sent in the background by Broadcaster.py (rate limited, blocked chats skipped)  |
+# | 8. Excel files are sent with Documents.SendDocument() (unchanged files are not uploaded again)   |
+# | 9. Every handler is timed (@Metrics.Handler), /metrics shows the timings to ADMIN_IDS (.env)     |
+# |    --> also served at http://127.0.0.1:METRICS_PORT/metrics for prometheus (see Metrics.py)      |
+# | 10. /profile [COMMAND] [ARGUMENTS] runs a command under cProfile (admins, see Profiler.py)       |
 # |                                                                                                  |
 # |==================================================================================================|
 
+@Metrics.Handler
 async def Start(update, context):
     chatID = update.effective_chat.id
     username = update.effective_chat.username
 
-    with open('data/reference/username_ref.json') as file:
-        usernameRef = load(file)
-    
-    usernameRef[str(chatID)] = {'cos': '', 'username': username}
-
-    with open('data/reference/username_ref.json', 'w') as file:
-        dump(usernameRef, file, indent=1)
+    StateStore.SetUser(chatID, username)
     
     await context.bot.send_message(chatID, '/help to view commands\n/cos to set rank and name')
 
+@Metrics.Handler
 async def Help(update, context):
     chatID = update.effective_chat.id
 
@@ -47,31 +60,40 @@ async def Help(update, context):
         for msg in file.read().split('---SPLIT---'):
             await context.bot.send_message(chatID, msg)
 
+@Metrics.Handler
 async def TermsOfReference(update, context):
     chatID = update.effective_chat.id
 
     with open('data/text/terms_of_reference.txt') as file:
         await context.bot.send_message(chatID, file.read(), parse_mode='MarkdownV2', disable_web_page_preview=True)
 
+@Metrics.Handler
 async def Escort(update, context):
     chatID = update.effective_chat.id
 
     with open('data/text/escort.txt') as file:
         await context.bot.send_message(chatID, file.read())
 
+@Metrics.Handler
 async def FullPS(update, context):
     chatID = update.effective_chat.id
     dateDT = DateChecker.SingleDate(context.args)
 
     if dateDT is not None:
         dataManager = ps.DataManager(chatID)
-        await context.bot.send_message(chatID, dataManager.FullPS(dateDT))
+
+        try:
+            await context.bot.send_message(chatID, await Workers.Run(dataManager.FullPS, dateDT))
+        except SheetStore.SheetUnavailable as error:
+            await context.bot.send_message(chatID, str(error))
+            return
         
         if dataManager.categorisedPersonnel['UNKNOWN']:
             await context.bot.send_message(chatID, 'UNKNOWN:\n' + '\n'.join(person.displayFull for person in dataManager.categorisedPersonnel["UNKNOWN"]))
     else:
         await context.bot.send_message(chatID, 'Invalid date')
 
+@Metrics.Handler
 async def Weekend(update, context):
     chatID = update.effective_chat.id
     startDateDT, endDateDT = DateChecker.DoubleDate(context.args, 9)
@@ -80,10 +102,34 @@ async def Weekend(update, context):
         await context.bot.send_message(chatID, 'Dates are too far apart')
     elif startDateDT is not None:
         dataManager = ps.DataManager()
-        await context.bot.send_message(chatID, dataManager.CombinedBottomPS(startDateDT, endDateDT))
+
+        # days are joined (with ps.daySeparator) into as few messages as possible, and a message is sent as soon as the next day
+        # does not fit in it, so days are only split if one day is too long for one message
+        pending = ''
+        unavailable = None
+
+        try:
+            async for psBottom in Workers.Iterate(dataManager.StreamBottomPS(startDateDT, endDateDT)):
+                if pending and len(pending) + len(ps.daySeparator) + len(psBottom) <= 4096:
+                    pending += ps.daySeparator + psBottom
+                    continue
+
+                for message in Functions.SplitMessage(pending) if pending else []:
+                    await context.bot.send_message(chatID, message)
+
+                pending = psBottom
+        except SheetStore.SheetUnavailable as error:
+            unavailable = str(error)
+
+        for message in Functions.SplitMessage(pending) if pending else []:
+            await context.bot.send_message(chatID, message)
+
+        if unavailable is not None:
+            await context.bot.send_message(chatID, unavailable)
     else:
         await context.bot.send_message(chatID, 'Invalid dates')
 
+@Metrics.Handler
 async def DutyForecast(update, context):
     chatID = update.effective_chat.id
     startDateDT, endDateDT = DateChecker.DoubleDate(context.args, 30, False, False)
@@ -91,11 +137,18 @@ async def DutyForecast(update, context):
     if startDateDT == 'tooFar':
         await context.bot.send_message(chatID, 'Dates are too far apart')
     elif startDateDT is not None:
-        ExcelProcesser.ObtainDutyForecastExcel(startDateDT, endDateDT)
-        await context.bot.send_document(chatID, open('data/excel files/out/dutyForecast.xlsx', 'rb'))
+        # made in memory for every request (not saved to data/excel files/out), so requests cannot overwrite each other
+        try:
+            excel = await Workers.Run(ExcelProcesser.ObtainDutyForecastExcel, startDateDT, endDateDT)
+        except SheetStore.SheetUnavailable as error:
+            await context.bot.send_message(chatID, str(error))
+            return
+
+        await Documents.SendDocument(context.bot, chatID, excel, 'dutyForecast.xlsx')
     else:
         await context.bot.send_message(chatID, 'Invalid dates')
 
+@Metrics.Handler
 async def OverrideListPrint(update, context):
     chatID = update.effective_chat.id
     overrideList = Functions.OverrideListCategoriser()
@@ -103,6 +156,7 @@ async def OverrideListPrint(update, context):
     for x in overrideList:
         await context.bot.send_message(chatID, x)
 
+@Metrics.Handler
 async def OverrideListEdit_FIRST(update, context):
     chatID = update.effective_chat.id
     keyboard = [['ADD STATUS'], ['REMOVE STATUS']]
@@ -110,17 +164,16 @@ async def OverrideListEdit_FIRST(update, context):
     await context.bot.send_message(chatID, 'Select what you would like to do\n/exit to exit', reply_markup = ReplyKeyboardMarkup(keyboard))
     return 1
 
+@Metrics.Handler
 async def OverrideListEdit_SECOND_ADD(update, context):
     chatID = update.effective_chat.id
 
-    with open('data/personnel/alpha.json') as file:
-        alphaList = load(file)
-    
-    keyboard = [[x['displayNoStatus']] for x in alphaList]
+    keyboard = [[x['displayNoStatus']] for x in DataStore.Load('data/personnel/alpha.json')]
 
     await context.bot.send_message(chatID, 'Select a personnel\n/exit to exit', reply_markup = ReplyKeyboardMarkup(keyboard))
     return 2
 
+@Metrics.Handler
 async def OverrideListEdit_THIRD_ADD(update, context):
     chatID = update.effective_chat.id
     DisplayToSheet = Functions.ObtainMap('displayNoStatus', 'sheetName')
@@ -136,6 +189,7 @@ async def OverrideListEdit_THIRD_ADD(update, context):
 
     return 3
 
+@Metrics.Handler
 async def OverrideListEdit_FOURTH_ADD(update, context):
     chatID = update.effective_chat.id
     context.user_data['sheetStatus'] = re.sub('\s*/\s*', '/', update.message.text.upper().strip())
@@ -148,15 +202,13 @@ async def OverrideListEdit_FOURTH_ADD(update, context):
 
     return 4
 
+@Metrics.Handler
 async def OverrideListEdit_FIFTH_ADD(update, context):
     chatID = update.effective_chat.id
     startDateDT, endDateDT = DateChecker.DoubleDate(update.message.text.split(), None, False, False)
 
     if startDateDT is not None:
-        with open('data/override/parade_state_override.json') as file:
-            psOverride = load(file)
-        
-        psOverride.append(
+        StateStore.AddOverride(
             {
                 'sheetName': context.user_data['sheetName'],
                 'sheetStatus': context.user_data['sheetStatus'],
@@ -164,9 +216,6 @@ async def OverrideListEdit_FIFTH_ADD(update, context):
                 'endDate': Functions.DateConverter(endDateDT)
             }
         )
-
-        with open('data/override/parade_state_override.json', 'w') as file:
-            dump(psOverride, file, indent = 1)
         
         await context.bot.send_message(chatID, 'Successfully added! Use /ol to view full override list.')
         return ConversationHandler.END
@@ -174,16 +223,16 @@ async def OverrideListEdit_FIFTH_ADD(update, context):
         await context.bot.send_message(chatID, 'Invalid dates\nRetype dates or /exit to exit')
         return 4
 
+@Metrics.Handler
 async def OverrideListEdit_SECOND_REMOVE(update, context):
     chatID = update.effective_chat.id
-    with open('data/override/parade_state_override.json') as file:
-        context.user_data['psOverride'] = load(file)
+    activeOverride = OverrideIndex.Open().Active(Functions.CurrentDatetime().replace(tzinfo=None), 'psOverride')
     
-    if not context.user_data['psOverride']:
+    if not activeOverride:
         await context.bot.send_message(chatID, 'Override list is empty', reply_markup = ReplyKeyboardRemove())
         return ConversationHandler.END
     
-    context.user_data['resultDict'] = Functions.ObtainResultDict(Functions.ObtainMap('sheetName', 'displayNoStatus'), context.user_data['psOverride'])
+    context.user_data['resultDict'] = Functions.ObtainResultDict(Functions.ObtainMap('sheetName', 'displayNoStatus'), activeOverride)
 
     keyboard = [[x[0]] for x in context.user_data['resultDict'].values()]
 
@@ -191,6 +240,7 @@ async def OverrideListEdit_SECOND_REMOVE(update, context):
     await context.bot.send_message(chatID, 'Select personnel whose status you want to remove\n/exit to exit', reply_markup = ReplyKeyboardMarkup(keyboard))
     return 5
 
+@Metrics.Handler
 async def OverrideListEdit_THIRD_REMOVE(update, context):
     chatID = update.effective_chat.id
     displayToSheet = Functions.ObtainMap('displayNoStatus', 'sheetName')
@@ -201,6 +251,7 @@ async def OverrideListEdit_THIRD_REMOVE(update, context):
     await context.bot.send_message(chatID, 'Select status which you want to remove\n/exit to exit', reply_markup = ReplyKeyboardMarkup(keyboard))
     return 6
 
+@Metrics.Handler
 async def OverrideListEdit_FOURTH_REMOVE(update, context):
     chatID = update.effective_chat.id
     messageSplit = update.message.text.split()
@@ -212,18 +263,17 @@ async def OverrideListEdit_FOURTH_REMOVE(update, context):
         'endDate': messageSplit[2]
     }
 
-    context.user_data['psOverride'] = [x for x in context.user_data['psOverride'] if x != toMatch]
-
-    with open('data/override/parade_state_override.json', 'w') as file:
-        dump(context.user_data['psOverride'], file, indent=1)
+    StateStore.RemoveOverride(toMatch)
     
     await context.bot.send_message(chatID, 'Successfully removed! Use /ol to view full override list.', reply_markup = ReplyKeyboardRemove())
     return ConversationHandler.END
 
+@Metrics.Handler
 async def RationsListPrint(update, context):
     chatID = update.effective_chat.id
     await context.bot.send_message(chatID, Functions.RationsListCategoriser())
 
+@Metrics.Handler
 async def RationsListEdit_FIRST(update, context):
     chatID = update.effective_chat.id
     keyboard = [['EDIT EVERYDAY'], ['EDIT SPECIFIC DAYS'], ['REMOVE SPECIFIC DAYS']]
@@ -231,25 +281,21 @@ async def RationsListEdit_FIRST(update, context):
     await context.bot.send_message(chatID, 'Select one\n/exit to exit', reply_markup = ReplyKeyboardMarkup(keyboard))
     return 1
 
+@Metrics.Handler
 async def RationsListEdit_SECOND_EVERYDAY(update, context):
     chatID = update.effective_chat.id
     await context.bot.send_message(chatID, 'NOTE: if no rations indented, put 0', reply_markup = ReplyKeyboardRemove())
     await context.bot.send_message(chatID, 'Input: [BREAKFAST PAX] [LUNCH PAX] [DINNER PAX]\n/exit to exit')
     return 2
 
+@Metrics.Handler
 async def RationsListEdit_THIRD_EVERYDAY(update, context):
     chatID = update.effective_chat.id
 
     if re.search(r'^[0-9]{1,2} [0-9]{1,2} [0-9]{1,2}$', update.message.text):
         msgSplit = [int(x) for x in update.message.text.split()]
 
-        with open('data/override/rations.json') as file:
-            rations = load(file)
-
-        rations['everyday'] = msgSplit
-
-        with open('data/override/rations.json', 'w') as file:
-            dump(rations, file, indent = 1)
+        StateStore.SetRations('everyday', msgSplit)
 
         await context.bot.send_message(chatID, 'Successfully updated! Use /rl to view full rations list.')
         return ConversationHandler.END
@@ -257,12 +303,14 @@ async def RationsListEdit_THIRD_EVERYDAY(update, context):
         await context.bot.send_message(chatID, 'Invalid input\nRetype input or /exit to exit')
         return 2
 
+@Metrics.Handler
 async def RationsListEdit_SECOND_SPECIFIC(update, context):
     chatID = update.effective_chat.id
     await context.bot.send_message(chatID, 'NOTE: if no rations indented, put 0', reply_markup = ReplyKeyboardRemove())
     await context.bot.send_message(chatID, 'Input: [DATE] [BREAKFAST PAX] [LUNCH PAX] [DINNER PAX]\n/exit to exit')
     return 3
 
+@Metrics.Handler
 async def RationsListEdit_THIRD_SPECIFIC(update, context):
     chatID = update.effective_chat.id
     
@@ -273,13 +321,7 @@ async def RationsListEdit_THIRD_SPECIFIC(update, context):
         if dateDT is not None:
             msgSplit = [int(x) for x in update.message.text.split()[1:]]
 
-            with open('data/override/rations.json') as file:
-                rations = load(file)
-
-            rations[dateRAW] = msgSplit
-        
-            with open('data/override/rations.json', 'w') as file:
-                dump(rations, file, indent = 1)
+            StateStore.SetRations(dateRAW, msgSplit)
             
             await context.bot.send_message(chatID, 'Successfully updated! Use /rl to view full rations list.')
             return ConversationHandler.END
@@ -287,13 +329,11 @@ async def RationsListEdit_THIRD_SPECIFIC(update, context):
     await context.bot.send_message(chatID, 'Invalid input\nRetype input or /exit to exit')
     return 3
 
+@Metrics.Handler
 async def RationsListEdit_SECOND_REMOVE(update, context):
     chatID = update.effective_chat.id
 
-    with open('data/override/rations.json') as file:
-        rations = load(file)
-
-    keyboard = [[x] for x in rations if x!= 'everyday']
+    keyboard = [[x] for x in StateStore.Rations() if x!= 'everyday']
 
     if not keyboard:
         await context.bot.send_message(chatID, 'No dates to remove', reply_markup = ReplyKeyboardRemove())
@@ -302,112 +342,171 @@ async def RationsListEdit_SECOND_REMOVE(update, context):
     await context.bot.send_message(chatID, 'Select date to remove\n/exit to exit', reply_markup = ReplyKeyboardMarkup(keyboard))
     return 4
 
+@Metrics.Handler
 async def RationsListEdit_THIRD_REMOVE(update, context):
     chatID = update.effective_chat.id
 
-    with open('data/override/rations.json') as file:
-        rations = load(file)
-    
-    del rations[update.message.text]
-
-    with open('data/override/rations.json', 'w') as file:
-        dump(rations, file, indent = 1)
+    StateStore.RemoveRations(update.message.text)
     
     await context.bot.send_message(chatID, 'Successfully removed! Use /rl to view full rations list.', reply_markup = ReplyKeyboardRemove())
     return ConversationHandler.END
 
+@Metrics.Handler
 async def PersonnelListPrint(update, context):
     chatID = update.effective_chat.id
-    ExcelProcesser.ObtainFlightPersonnelExcel(False)
-    await context.bot.send_document(chatID, open('data/excel files/out/flightPersonnel.xlsx', 'rb'))
+    excel = await Workers.Run(Workers.MakeFile, 'data/excel files/out/flightPersonnel.xlsx', ExcelProcesser.ObtainFlightPersonnelExcel, False)
+    await Documents.SendDocument(context.bot, chatID, excel, 'flightPersonnel.xlsx')
 
+@Metrics.Handler
 async def PersonnelListEdit_FIRST(update, context):
     chatID = update.effective_chat.id
-    ExcelProcesser.ObtainFlightPersonnelExcel(True)
-    await context.bot.send_document(
+    excel = await Workers.Run(Workers.MakeFile, 'data/excel files/out/flightPersonnel.xlsx', ExcelProcesser.ObtainFlightPersonnelExcel, True)
+    await Documents.SendDocument(
+        context.bot,
         chatID,
-        open('data/excel files/out/flightPersonnel.xlsx', 'rb'),
+        excel,
+        'flightPersonnel.xlsx',
         caption = 'Instructions inside\n/exit to exit'
     )
     
     return 1
 
+@Metrics.Handler
 async def PersonnelListEdit_SECOND(update, context):
     chatID = update.effective_chat.id
     file = await update.message.effective_attachment.get_file()
-    await file.download_to_drive('data/excel files/in/flightPersonnel.xlsx')
+    content = bytes(await file.download_as_bytearray())
 
-    ExcelProcesser.EditFlightPersonnelExcel()
+    await Workers.Run(Workers.UseFile, 'data/excel files/in/flightPersonnel.xlsx', content, ExcelProcesser.EditFlightPersonnelExcel)
     
     await context.bot.send_message(chatID, 'Successfully updated! Use /pl to view all personnel.')
     return ConversationHandler.END
 
+@Metrics.Handler
 async def StatusReferenceListPrint(update, context):
     chatID = update.effective_chat.id
-    ExcelProcesser.ObtainStatusReferenceExcel(False)
-    await context.bot.send_document(chatID, open('data/excel files/out/statusReference.xlsx', 'rb'))
+    excel = await Workers.Run(Workers.MakeFile, 'data/excel files/out/statusReference.xlsx', ExcelProcesser.ObtainStatusReferenceExcel, False)
+    await Documents.SendDocument(context.bot, chatID, excel, 'statusReference.xlsx')
 
+@Metrics.Handler
 async def StatusReferenceListEdit_FIRST(update, context):
     chatID = update.effective_chat.id
-    ExcelProcesser.ObtainStatusReferenceExcel(True)
-    await context.bot.send_document(
+    excel = await Workers.Run(Workers.MakeFile, 'data/excel files/out/statusReference.xlsx', ExcelProcesser.ObtainStatusReferenceExcel, True)
+    await Documents.SendDocument(
+        context.bot,
         chatID,
-        open('data/excel files/out/statusReference.xlsx', 'rb'),
+        excel,
+        'statusReference.xlsx',
         caption = 'Instructions inside\n/exit to exit'
     )
     
     return 1
 
+@Metrics.Handler
 async def StatusReferenceListEdit_SECOND(update, context):
     chatID = update.effective_chat.id
     file = await update.message.effective_attachment.get_file()
-    await file.download_to_drive('data/excel files/in/statusReference.xlsx')
+    content = bytes(await file.download_as_bytearray())
 
-    ExcelProcesser.EditStatusReferenceExcel()
+    await Workers.Run(Workers.UseFile, 'data/excel files/in/statusReference.xlsx', content, ExcelProcesser.EditStatusReferenceExcel)
     
     await context.bot.send_message(chatID, 'Successfully updated! Use /sl to view all statuses.')
     return ConversationHandler.END
 
+@Metrics.Handler
 async def Cos_FIRST(update, context):
     chatID = update.effective_chat.id
     await context.bot.send_message(chatID, 'Enter your rank and name (eg. 3sg bob)\n/exit to exit')
     return 1
 
+@Metrics.Handler
 async def Cos_SECOND(update, context):
     chatID = update.effective_chat.id
-    with open('data/reference/username_ref.json') as file:
-        usernameRef = load(file)
-    
     cos = update.message.text.upper().strip()
-    usernameRef[str(chatID)]['cos'] = cos
-
-    with open('data/reference/username_ref.json', 'w') as file:
-        dump(usernameRef, file, indent=1)
+    StateStore.SetCos(chatID, cos)
     
     await context.bot.send_message(chatID, 'Updated successfully! COS: ' + cos)
     return ConversationHandler.END
 
+@Metrics.Handler
 async def Status(update, context):
     chatID = update.effective_chat.id
     await context.bot.send_message(chatID, Functions.StatusListCategoriser())
 
+@Metrics.Handler
 async def UpdateAll(update, context):
     chatID = update.effective_chat.id
     message = await context.bot.send_message(chatID, 'Updating... 0% Done')
     messageID = message.message_id
     
-    await Scheduled.EveryThirtyMinutes(context, False)
-    await context.bot.edit_message_text('Updating... 50% Done', chatID, messageID)
+    changedMonths = await Scheduled.EveryThirtyMinutes(context, False)
+    changed = ', '.join(f'{month}/{year}' for month, year in changedMonths) or 'NIL'
+    await context.bot.edit_message_text(f'Updating... 50% Done\nSheets changed: {changed}', chatID, messageID)
     await Scheduled.EveryDaily(context)
     await context.bot.edit_message_text('Updating... 100% Done', chatID, messageID)
     await Scheduled.EveryMonth(context)
     await context.bot.edit_message_text(Functions.StatusListCategoriser(), chatID, messageID)
 
+@Metrics.Handler
+async def MetricsSummary(update, context):
+    chatID = update.effective_chat.id
+
+    if not Metrics.IsAdmin(chatID):
+        await context.bot.send_message(chatID, 'Only admins can use /metrics')
+        return
+
+    for message in Functions.SplitMessage(Metrics.Summary()):
+        await context.bot.send_message(chatID, message)
+
+@Metrics.Handler
+async def Profile(update, context):
+    chatID = update.effective_chat.id
+
+    if not Metrics.IsAdmin(chatID):
+        await context.bot.send_message(chatID, 'Only admins can use /profile')
+        return
+
+    # commands that can be profiled (only these do their work in Workers.Run)
+    commands = {'f': FullPS, 'we': Weekend, 'df': DutyForecast, 'pl': PersonnelListPrint, 'sl': StatusReferenceListPrint, 'update': UpdateAll}
+    command = context.args[0].lstrip('/').lower() if context.args else None
+
+    if command == 'slow':
+        latest = await Workers.Run(Profiler.LatestSlow)
+
+        if latest is None:
+            await context.bot.send_message(chatID, 'No slow commands saved (PROFILE_SAMPLE_RATE in .env)')
+        else:
+            await Documents.SendDocument(context.bot, chatID, latest[1], latest[0])
+        return
+
+    if command not in commands:
+        await context.bot.send_message(chatID, f'/profile [{"/".join(commands)}/slow] [ARGUMENTS (optional)]\n(eg. /profile df 010224 200224)')
+        return
+
+    # the command is ran as if it was sent without /profile
+    context.args = context.args[1:]
+
+    with Profiler.Capture() as capture:
+        await commands[command](update, context)
+
+    stats = capture.Stats()
+
+    if stats is None:
+        await context.bot.send_message(chatID, f'/{command} did not run anything to profile')
+        return
+
+    for message in Functions.SplitMessage(await Workers.Run(Profiler.Top, stats)):
+        await context.bot.send_message(chatID, message)
+
+    await Documents.SendDocument(context.bot, chatID, await Workers.Run(Profiler.Dump, stats), f'{command}.pstats')
+
+@Metrics.Handler
 async def Broadcast_FIRST(update, context):
     chatID = update.effective_chat.id
     await context.bot.send_message(chatID, 'Type the message you want to send out.\n/exit to exit')
     return 1
 
+@Metrics.Handler
 async def Broadcast_SECOND(update, context):
     chatID = update.effective_chat.id
     context.user_data['message'] = update.message.text
@@ -416,40 +515,61 @@ async def Broadcast_SECOND(update, context):
     await context.bot.send_message(chatID, context.user_data['message'], reply_markup = ReplyKeyboardMarkup(keyboard))
     return 2
 
+@Metrics.Handler
 async def Broadcast_THIRD(update, context):
     chatID = update.effective_chat.id
-    with open('data/reference/username_ref.json') as file:
-        usernameRef = load(file)
 
     if update.message.text == 'YES':
-        await context.bot.send_message(chatID, 'Message Broadcasted.', reply_markup = ReplyKeyboardRemove())
-        for x in usernameRef.keys():
-            await context.bot.send_message(x, context.user_data['message'])
+        await context.bot.send_message(chatID, 'Message will be broadcasted.', reply_markup = ReplyKeyboardRemove())
+        message = await context.bot.send_message(chatID, 'Broadcasting...')
+
+        # sent in the background, so this chat (and every other chat) can keep using the bot
+        async def Send(text, messageID):
+            result = await Broadcaster.Broadcast(context.bot, text, chatID, messageID)
+            await context.bot.edit_message_text(Broadcaster.Summary(result), chatID, messageID)
+
+        context.application.create_task(Send(context.user_data['message'], message.message_id))
     else:
         await context.bot.send_message(chatID, 'Message not sent.', reply_markup = ReplyKeyboardRemove())
     return ConversationHandler.END
 
+@Metrics.Handler
 async def ADWSheetEditHandler_FIRST(update, context):
     chatID = update.effective_chat.id
-    ExcelProcesser.ObtainADWExcelSheet()
-    await context.bot.send_document(
+    excel = await Workers.Run(Workers.MakeFile, 'data/excel files/out/adw.xlsx', ExcelProcesser.ObtainADWExcelSheet)
+    await Documents.SendDocument(
+        context.bot,
         chatID,
-        open('data/excel files/out/adw.xlsx', 'rb'),
-        caption = 'Edit !!!\n/exit to exit'
+        excel,
+        'adw.xlsx',
+        caption = 'Edit !!!\nSend it back with the month it is for as the caption [MMYY] (eg. 0224 for Feb 24)\n/exit to exit'
     )
 
     return 1
 
+@Metrics.Handler
 async def ADWSheetEditHandler_SECOND(update, context):
     chatID = update.effective_chat.id
+
+    # the sheet does not say which month it is for, so it is never guessed (eg. next month's sheet sent at the end of the month)
+    monthKey = DateChecker.MonthCheck(update.message.caption)
+
+    if monthKey is None:
+        await context.bot.send_message(chatID, 'Send the sheet again with the month it is for as the caption [MMYY] (eg. 0224 for Feb 24)\n/exit to exit')
+        return 1
+
     file = await update.message.effective_attachment.get_file()
-    await file.download_to_drive('data/excel files/in/adw.xlsx')
+    content = bytes(await file.download_as_bytearray())
 
-    ExcelProcesser.EditADWExcelSheet()
+    if await Workers.Run(Workers.UseFile, 'data/excel files/in/adw.xlsx', content, ExcelProcesser.EditADWExcelSheet, *monthKey):
+        await context.bot.send_message(chatID, f'Updated for {monthKey[0]}/{monthKey[1]}')
+    else:
+        await context.bot.send_message(chatID, f'Not updated, the sheet does not have a column for every day of {monthKey[0]}/{monthKey[1]}\n/exit to exit')
+        return 1
 
-    await context.bot.send_message(chatID, 'Should have been updated idk')
     return ConversationHandler.END
 
+@Metrics.Handler
 async def Exit(update, context):
     chatID = update.effective_chat.id
     await context.bot.send_message(chatID, 'Exit ok \U0001F44D', reply_markup = ReplyKeyboardRemove())
@@ -458,14 +578,13 @@ async def Exit(update, context):
 if __name__ == "__main__":
     load_dotenv()
 
-    bot = ApplicationBuilder().token(os.getenv('API_KEY')).build()
+    # same connection pool as ApplicationBuilder's own request (256 connections), only timed (see Metrics.TimedRequest)
+    bot = ApplicationBuilder().token(os.getenv('API_KEY')).application_class(Workers.OrderedApplication).concurrent_updates(Workers.UpdateLimit()).request(Metrics.TimedRequest(connection_pool_size=256)).build()
+    Metrics.Serve()
 
-    # bascially /update (ensures that all stuff is up to date)
-    Scheduled.DownloadDatabase()
-    Scheduled.ObtainMergedCells()
-    Scheduled.RemoveOutdated()
-    Scheduled.GetGlobalVariables()
-    Scheduled.GetGlobalVariables()
+    # the bot starts with the data already on disk (csv files not in History yet are added, no downloads),
+    # anything outdated is refreshed in the background after polling starts (see Scheduled.StartupRefresh)
+    History.IngestDatabase()
 
     OverrideListEditHandler = ConversationHandler(
         entry_points = [CommandHandler('oe', OverrideListEdit_FIRST)],
@@ -535,6 +654,7 @@ if __name__ == "__main__":
         fallbacks = [CommandHandler('exit', Exit)]
     )
 
+    bot.job_queue.run_once(Scheduled.StartupRefresh, 0)
     bot.job_queue.run_repeating(Scheduled.EveryThirtyMinutes, datetime.timedelta(minutes=30), datetime.time(0, 0))
     bot.job_queue.run_daily(Scheduled.EveryDaily, datetime.time(0, 0))
     bot.job_queue.run_monthly(Scheduled.EveryMonth, datetime.time(0, 0), -1)
@@ -557,6 +677,8 @@ if __name__ == "__main__":
     bot.add_handler(CosHandler)
     bot.add_handler(CommandHandler('status', Status))
     bot.add_handler(CommandHandler('update', UpdateAll))
+    bot.add_handler(CommandHandler('metrics', MetricsSummary))
+    bot.add_handler(CommandHandler('profile', Profile))
     bot.add_handler(BroadcastHandler)
     bot.add_handler(ADWSheetHandler)
 